@@ -36,17 +36,24 @@ from .api.static.zone import *
 
 from .operators.nodetree_to_script import *
 from .operators.nodetree_to_script import CopySelectedNodes, CopyNodeTree
+from .operators.batch_export import ExportNodeTrees
 
-from .api.noderegistrar import register_node_types
-node_tree_types = ['Geometry','Shader','Texture','Compositor']
+from .api.noderegistrar import get_node_registrar, node_tree_types, node_registrars
+
+documented_tree_types = set()
 
 def create_documentation():
-    for node_tree_type in node_tree_types:
-         noderegistrar = register_node_types(node_tree_type)
-         Docs(noderegistrar,node_tree_type).create_documentation()
+    # Node types are only registered once a tree type is used, which is done on the main thread and can be slow,
+    # so the documentation of a tree type is written in the background once its nodes have been registered.
+    new_tree_types = [ node_tree_type for node_tree_type in node_registrars if node_tree_type not in documented_tree_types ]
+    documented_tree_types.update(new_tree_types)
+    if new_tree_types:
+        Docs.create_documentation_in_background([ Docs(node_registrars[node_tree_type],node_tree_type) for node_tree_type in new_tree_types ])
+    return 1
 
 
-bpy.app.timers.register(create_documentation)
+if not bpy.app.background:
+    bpy.app.timers.register(create_documentation)
 
 
 bl_info = {
@@ -64,6 +71,9 @@ def copy_menu(self, context):
     self.layout.operator(CopySelectedNodes.bl_idname)
     self.layout.operator(CopyNodeTree.bl_idname)
 
+def export_menu(self, context):
+    self.layout.operator(ExportNodeTrees.bl_idname)
+
 
 class TEXT_MT_templates_geometryscript(bpy.types.Menu):
     bl_label = "NodeTree Script"
@@ -85,6 +95,8 @@ class OpenDocumentation(bpy.types.Operator):
         items = [(node_tree_type, node_tree_type, "") for node_tree_type in node_tree_types]
     )
     def execute(self, context):
+        Docs(get_node_registrar(self.doc_type),self.doc_type).create_documentation()
+        documented_tree_types.add(self.doc_type)
         webbrowser.open('file://' + absolute_path(f'docs/{self.doc_type.lower()}_documentation.html'))
         return {'FINISHED'}
 
@@ -144,6 +156,8 @@ def register():
     bpy.utils.register_class(CopySelectedNodes)
     bpy.utils.register_class(CopyNodeTree)
     bpy.types.NODE_MT_context_menu.append(copy_menu)
+    bpy.utils.register_class(ExportNodeTrees)
+    bpy.types.TOPBAR_MT_file_export.append(export_menu)
 
 def unregister():
     bpy.utils.unregister_class(TEXT_MT_templates_geometryscript)
@@ -157,7 +171,11 @@ def unregister():
     bpy.utils.unregister_class(CopySelectedNodes)
     bpy.utils.unregister_class(CopyNodeTree)
     bpy.types.NODE_MT_context_menu.remove(copy_menu)
+    bpy.utils.unregister_class(ExportNodeTrees)
+    bpy.types.TOPBAR_MT_file_export.remove(export_menu)
     try:
         bpy.app.timers.unregister(auto_resolve)
     except:
         pass
+    if bpy.app.timers.is_registered(create_documentation):
+        bpy.app.timers.unregister(create_documentation)
@@ -1,43 +1,154 @@
 import bpy
 import typing
-from collections import deque, Counter
-from .util import level_topo_sort
+import numpy as np
+from collections import defaultdict
+from itertools import count
+from .util import get_property_infos
+from .treeindex import TreeIndex
 
-def _arrange(node_tree, padding: typing.Tuple[float, float] = (50, 25)):
-    graph = { node:set() for node in node_tree.nodes }
-    node_input_link_count = Counter()
-    for link in node_tree.links:
-        graph[link.from_node].add(link.to_node)
-        node_input_link_count[link.to_socket] += 1
+# Layered (Sugiyama-style) layout:
+# nodes are placed in columns by longest path to a sink, columns are ordered to reduce link crossings,
+# and every node is moved as close as possible to the median of the nodes linked into it.
 
-    columns = level_topo_sort(graph)
+NODE_HEADER_HEIGHT = 20
+NODE_LINK_HEIGHT = 28
+NODE_PROPERTY_HEIGHT = 28
+NODE_VECTOR_HEIGHT = 84
+CROSSING_REDUCTION_SWEEPS = 4
+
+# Node heights by node type and socket configuration, computed manually so arrangement can be done without UI being visible.
+node_heights = {}
+
+def node_height(node, linked_sockets):
+    inputs = [ node_input for node_input in node.inputs if node_input.enabled ]
+    output_count = sum( 1 for node_output in node.outputs if node_output.enabled )
+    unset_vector_count = sum( 1 for node_input in inputs if node_input.type == 'VECTOR' and node_input.as_pointer() not in linked_sockets )
+    key = (node.bl_idname, len(inputs), output_count, unset_vector_count)
+    height = node_heights.get(key)
+    if height is None:
+        height = node_heights[key] = (
+            NODE_HEADER_HEIGHT \
+            + (output_count * NODE_LINK_HEIGHT) \
+            + (len(get_property_infos(type(node))) * NODE_PROPERTY_HEIGHT) \
+            + (len(inputs) * NODE_LINK_HEIGHT) \
+            + (unset_vector_count * NODE_VECTOR_HEIGHT)
+        )
+    return height
+
+def layer_graph(index):
+    # Columns of nodes, with links spanning several columns split by virtual nodes so that every link joins adjacent columns.
+    graph = index.graph
+    layers = [ list(layer) for layer in index.levels() ]
+    layer_index = { node: i for i, layer in enumerate(layers) for node in layer }
+    upstream = defaultdict(list)
+    downstream = defaultdict(list)
+    virtual_ids = count()
+    for from_node, to_nodes in graph.items():
+        for to_node in to_nodes:
+            # Links of the nodes in the last column, left out of the topological sort, can go back to an earlier column: they are not laid out.
+            if layer_index[to_node] <= layer_index[from_node]:
+                continue
+            previous = from_node
+            for i in range(layer_index[from_node] + 1, layer_index[to_node]):
+                virtual_node = ('virtual', next(virtual_ids))
+                layers[i].append(virtual_node)
+                upstream[virtual_node].append(previous)
+                downstream[previous].append(virtual_node)
+                previous = virtual_node
+            upstream[to_node].append(previous)
+            downstream[previous].append(to_node)
+    return layers, upstream, downstream
+
+def reduce_crossings(layers, upstream, downstream):
+    # Barycenter heuristic, sweeping left to right and back.
+    for _ in range(CROSSING_REDUCTION_SWEEPS):
+        for sweep, neighbors in ((range(1, len(layers)), upstream), (range(len(layers) - 2, -1, -1), downstream)):
+            for i in sweep:
+                adjacent = layers[i - 1] if neighbors is upstream else layers[i + 1]
+                position = { node: j for j, node in enumerate(adjacent) }
+                barycenter = {}
+                for j, node in enumerate(layers[i]):
+                    linked = neighbors[node]
+                    barycenter[node] = sum( position[n] for n in linked ) / len(linked) if linked else j
+                layers[i].sort(key=barycenter.__getitem__)
+
+def _arrange(node_tree, padding: typing.Tuple[float, float] = (50, 25), index=None):
+    index = TreeIndex(node_tree) if index is None else index
+    linked_sockets = index.linked_sockets
+    layers, upstream, downstream = layer_graph(index)
+    reduce_crossings(layers, upstream, downstream)
 
-    # Arrange the columns, computing the size of the node manually so arrangement can be done without UI being visible.
     UI_SCALE = bpy.context.preferences.view.ui_scale
-    NODE_HEADER_HEIGHT = 20
-    NODE_LINK_HEIGHT = 28
-    NODE_PROPERTY_HEIGHT = 28
-    NODE_VECTOR_HEIGHT = 84
-    x = 0
-    for col in columns:
-        largest_width = 0
-        y = 0
-        for node in col:
-            node.update()
-            input_count = len(list(filter(lambda i: i.enabled, node.inputs)))
-            output_count = len(list(filter(lambda i: i.enabled, node.outputs)))
-            parent_props = [prop.identifier for base in type(node).__bases__ for prop in base.bl_rna.properties]
-            properties_count = len([prop for prop in node.bl_rna.properties if prop.identifier not in parent_props])
-            unset_vector_count = len(list(filter(lambda i: i.enabled and i.type == 'VECTOR' and node_input_link_count[i] == 0, node.inputs)))
-            node_height = (
-                NODE_HEADER_HEIGHT \
-                + (output_count * NODE_LINK_HEIGHT) \
-                + (properties_count * NODE_PROPERTY_HEIGHT) \
-                + (input_count * NODE_LINK_HEIGHT) \
-                + (unset_vector_count * NODE_VECTOR_HEIGHT)
-            ) * UI_SCALE
-            if node.width > largest_width:
-                largest_width = node.width
-            node.location = (x, y)
-            y -= node_height + padding[1]
-        x += largest_width + padding[0]
\ No newline at end of file
+    widths = np.array([ max( (node.width for node in layer if not isinstance(node, tuple)), default=0 ) for layer in layers ])
+    xs = np.concatenate(([0.0], np.cumsum(widths + padding[0])[:-1]))
+    centers = {}
+    for layer, x in zip(layers, xs):
+        heights = np.array([ NODE_LINK_HEIGHT if isinstance(node, tuple) else node_height(node, linked_sockets) for node in layer ], dtype=float) * UI_SCALE
+        offsets = np.concatenate(([0.0], np.cumsum(heights + padding[1])[:-1]))
+        desired = np.array([ np.median([ centers[n] for n in upstream[node] ]) if upstream[node] else np.nan for node in layer ]) - heights / 2
+        has_desired = ~np.isnan(desired)
+        if has_desired.any():
+            # Closest tops to the desired ones keeping the column order and spacing: shifts relative to the stacked offsets must not decrease.
+            shifts = desired - offsets
+            shifts[~has_desired] = -np.inf
+            shifts[0] = max(shifts[0], shifts[has_desired][0])
+            tops = np.maximum.accumulate(shifts) + offsets
+            tops -= np.median((tops - desired)[has_desired])
+        else:
+            tops = offsets
+        for node, top, height in zip(layer, tops, heights):
+            centers[node] = top + height / 2
+            if not isinstance(node, tuple):
+                node.location = (float(x), float(-top))
+
+def _arrange_incremental(node_tree, new_nodes, padding: typing.Tuple[float, float] = (50, 25), index=None):
+    # Places the nodes in `new_nodes` (node pointers) next to the nodes linked to them, keeping the location of every other node
+    # except the ones that have to be moved down to make room.
+    index = TreeIndex(node_tree) if index is None else index
+    if len(new_nodes) == len(index.nodes):
+        return _arrange(node_tree, padding, index)
+
+    UI_SCALE = bpy.context.preferences.view.ui_scale
+    height = lambda node: node_height(node, index.linked_sockets) * UI_SCALE
+    placed = [ node for node in index.nodes if node.as_pointer() not in new_nodes ]
+    placed_pointers = { node.as_pointer() for node in placed }
+
+    for node in index.topological_order():
+        if node.as_pointer() in placed_pointers:
+            continue
+        inputs = [ n for n in index.upstream(node) if n.as_pointer() in placed_pointers ]
+        outputs = [ n for n in index.downstream(node) if n.as_pointer() in placed_pointers ]
+        if inputs:
+            x = max( n.location.x + n.width for n in inputs ) + padding[0]
+            y = float(np.median([ n.location.y for n in inputs ]))
+        elif outputs:
+            x = min( n.location.x for n in outputs ) - node.width - padding[0]
+            y = float(np.median([ n.location.y for n in outputs ]))
+        else:
+            x, y = 0.0, 0.0
+        node.location = (x, y)
+        make_room(node, placed, height, padding)
+        placed.append(node)
+        placed_pointers.add(node.as_pointer())
+
+def make_room(node, placed, height, padding):
+    def overlaps_horizontally(a, b):
+        return a.location.x < b.location.x + b.width and b.location.x < a.location.x + a.width
+
+    # Move the node below the nodes covering its top, then push down the nodes it covers, and the nodes these cover in turn.
+    moved = True
+    while moved:
+        moved = False
+        for other in placed:
+            bottom = other.location.y - height(other) - padding[1]
+            if overlaps_horizontally(node, other) and other.location.y >= node.location.y > bottom:
+                node.location.y = bottom
+                moved = True
+    stack = [node]
+    while stack:
+        above = stack.pop()
+        bottom = above.location.y - height(above) - padding[1]
+        for other in placed:
+            if other.as_pointer() != above.as_pointer() and overlaps_horizontally(above, other) and above.location.y >= other.location.y > bottom:
+                other.location.y = bottom
+                stack.append(other)
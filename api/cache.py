@@ -0,0 +1,52 @@
+import os
+import glob
+import pickle
+import hashlib
+from functools import cache
+from ..absolute_path import absolute_path
+
+# On-disk cache for data that is expensive to derive from a running Blender session.
+# Entries are stored together with a key and are only returned when the key matches.
+
+def cache_path(name, directory=None):
+    return os.path.join(directory or absolute_path('cache'), f'{name}.pickle')
+
+def load(name, key, directory=None):
+    try:
+        with open(cache_path(name, directory), 'rb') as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(entry, dict) or entry.get('key') != key:
+        return None
+    return entry.get('value')
+
+def save(name, key, value, directory=None):
+    path = cache_path(name, directory)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'key': key, 'value': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception:
+        return False
+    return True
+
+def make_key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+def addon_source_files():
+    def folder_glob(*args):
+        return glob.glob( absolute_path(os.path.join(*args,'**','*.py')), recursive=True )
+    excluded_files = set(folder_glob('typeshed') + folder_glob('examples'))
+    return sorted( path for path in folder_glob() if path not in excluded_files )
+
+@cache
+def addon_source_hash():
+    sha = hashlib.sha256()
+    for path in addon_source_files():
+        sha.update(os.path.relpath(path, absolute_path('')).encode())
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
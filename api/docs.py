@@ -1,26 +1,89 @@
 import os
 from ..absolute_path import absolute_path
-from .nodesocket import NodeSocket
-import bpy
+from . import cache
+import functools
 import glob
+import threading
+
+def write_if_changed(path, contents):
+    try:
+        with open(path) as f:
+            if f.read() == contents:
+                return False
+    except OSError:
+        pass
+    # Written next to the target and moved over it, so an interrupted write never leaves a truncated file.
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, 'w') as f:
+            f.write(contents)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
 
 class Docs():
-    def __init__(self, node_registrar,node_tree_type):
+    def __init__(self, node_registrar,node_tree_type,blender_version=None,socket_class_names=None,output_path=None):
         self.nr = node_registrar
         self.nr.node_infos = sorted( self.nr.node_infos, key= lambda x: x.func_name )
         self.node_tree_type = node_tree_type
+        if blender_version is None:
+            import bpy
+            blender_version = tuple(bpy.app.version)
+        if socket_class_names is None:
+            from .nodesocket import NodeSocket
+            socket_class_names = [ subclass.__name__ for subclass in NodeSocket.__subclasses__() ]
+        self.blender_version = tuple(blender_version)
+        self.socket_class_names = socket_class_names
+        self.output_path = output_path if output_path else absolute_path('')
+        # Documentation written elsewhere than the add-on directory keeps its cache next to it.
+        self.cache_directory = os.path.join(output_path, 'cache') if output_path else None
+        self.fingerprint = cache.make_key(
+            self.blender_version,
+            cache.addon_source_hash(),
+            self.socket_class_names,
+            self.output_path,
+            self.nr.to_dict()
+        )
 
     def create_documentation(self):
+        if self.is_up_to_date():
+            return
         self.augment_node_info()
-        self.write_typeshed()
-        self.write_docs()
+        self.write_documentation()
+
+    @staticmethod
+    def create_documentation_in_background(docs):
+        # Only the parts reading from Blender run on the calling thread, rendering and file writes are done by a worker.
+        docs = [ d for d in docs if not d.is_up_to_date() ]
+        for d in docs:
+            d.augment_node_info()
+        def write_all():
+            for d in docs:
+                d.write_documentation()
+        thread = threading.Thread(target=write_all, daemon=True)
+        thread.start()
+        return thread
+
+    def is_up_to_date(self):
+        written_files = cache.load(f"{self.node_tree_type.lower()}_docs", self.fingerprint, self.cache_directory)
+        return written_files is not None and all( os.path.exists(path) for path in written_files )
+
+    def write_documentation(self):
+        files = self.typeshed_files()
+        files.update(self.docs_files())
+        for path, contents in files.items():
+            os.makedirs( os.path.dirname(path), exist_ok=True )
+            write_if_changed(path, contents)
+        cache.save(f"{self.node_tree_type.lower()}_docs", self.fingerprint, list(files), self.cache_directory)
 
     def augment_node_info(self):
+        version = '.'.join([str(i) for i in self.blender_version[:2]])
+        img_prefix = 'compositing_' if self.node_tree_type == 'Compositor' else ''
         for node_info in self.nr.node_infos:
-            version = '.'.join([str(i) for i in bpy.app.version[:2]])
-            img_prefix = 'compositing_' if self.node_tree_type == 'Compositor' else ''
-
-            node_info.image = f"https://docs.blender.org/manual/en/{version}/_images/{img_prefix}node-types_{node_info.type.__name__}"
+            node_info.image = f"https://docs.blender.org/manual/en/{version}/_images/{img_prefix}node-types_{node_info.type_name}"
             node_info.link = f"https://docs.blender.org/manual/en/latest/modeling/geometry_nodes/None/{node_info.func_name}.html"
             node_info.typesig = Docs.make_type_signature(node_info.default_value,union_func=lambda x: x +' | None = None')
 
@@ -43,30 +106,28 @@ class Docs():
 
         return '(' + argdelim.join([f"{argname}: {union_type}" for argname, union_type in union_types.items()]) + ')'
 
-    def write_typeshed(self):
-        folders = 'typeshed/nodetree_script/api/dynamic'
-        os.makedirs( absolute_path(folders), exist_ok=True )
-        path = absolute_path( f"{folders}/{self.node_tree_type.lower()}.py" )
+    def typeshed_files(self):
+        files = {}
+        path = os.path.join( self.output_path, f"typeshed/nodetree_script/api/dynamic/{self.node_tree_type.lower()}.py" )
         contents = []
-        with open(path, 'w') as fpy, open(path+'i', 'w') as fpyi:
-            contents.append(self.import_string() )
-            contents.append(self.enums())
-            contents.append(self.node_funcs())
-            contents.append(self.math_funcs())
+        contents.append(self.import_string() )
+        contents.append(self.enums())
+        contents.append(self.node_funcs())
+        contents.append(self.math_funcs())
 
-            contents = ''.join(contents)
-            fpy.write(contents)
-            fpyi.write(contents)
+        contents = ''.join(contents)
+        files[path] = contents
+        files[path+'i'] = contents
 
-        path = absolute_path( f"typeshed/nodetree_script/__init__.py" )
+        path = os.path.join( self.output_path, "typeshed/nodetree_script/__init__.py" )
         contents = []
-        with open(path,'w') as fpy, open(path+'i', 'w') as fpyi:
-            contents.append(self.py_files())
-            contents.append(self.node_socket_subclasses())
+        contents.append(self.py_files())
+        contents.append(self.node_socket_subclasses())
 
-            contents = ''.join(contents)
-            fpy.write(contents)
-            fpyi.write(contents)
+        contents = ''.join(contents)
+        files[path] = contents
+        files[path+'i'] = contents
+        return files
 
     def import_string(self):
         return f"""import enum\n"""
@@ -94,11 +155,13 @@ class Docs():
     def math_funcs(self):
         return ''.join([f'def {func}(*vectors_or_values): pass\n' for func in self.nr.math_funcs])
 
-    def py_files(self):
+    @staticmethod
+    @functools.cache
+    def py_files():
         def folder_glob(*args):
             return glob.glob( absolute_path(os.path.join(*args,'**','*.py')  ),recursive=True )
         py_files = folder_glob()
-        excluded_files = folder_glob('api','dynamic') + folder_glob('typeshed') + folder_glob('examples') + [ absolute_path('__init__.py') ]
+        excluded_files = folder_glob('api','dynamic') + folder_glob('typeshed') + folder_glob('examples') + folder_glob('benchmarks') + [ absolute_path('__init__.py'), absolute_path('generate_docs.py') ]
         contents = "".join(
             f"# {os.path.basename(path)}\n{open(path).read()}\n\n"
             for path in py_files if path not in excluded_files
@@ -107,9 +170,9 @@ class Docs():
         return contents
 
     def node_socket_subclasses(self):
-        return '\n'.join([ f"class {subclass.__name__}({NodeSocket.__name__}): pass" for subclass in NodeSocket.__subclasses__() ]) + '\n'
+        return '\n'.join([ f"class {name}(NodeSocket): pass" for name in self.socket_class_names ]) + '\n'
 
-    def write_docs(self):
+    def docs_files(self):
         joined_docs = ''.join([self.doc_string(node_info) for node_info in self.nr.node_infos])
         html = f"""
         <html>
@@ -142,9 +205,8 @@ class Docs():
         </body>
         </html>
         """
-        path = absolute_path( f"docs/{self.node_tree_type.lower()}_documentation.html" )
-        with open(path, 'w') as f:
-            f.write(html)
+        path = os.path.join( self.output_path, f"docs/{self.node_tree_type.lower()}_documentation.html" )
+        return { path: html }
 
     def doc_string(self,node_info):
         color_mappings = {
@@ -185,7 +247,7 @@ class Docs():
         argdelim=',\n  '
         return f"""
             <details style="margin: 10px 0;">
-                <summary><code>{node_info.func_name}</code> - <a href="{node_info.link}">{node_info.type.bl_rna.name}</a></summary>
+                <summary><code>{node_info.func_name}</code> - <a href="{node_info.link}">{node_info.label}</a></summary>
                 <div style="margin-top: 5px;">
                     <img src="{node_info.image}.webp" onerror="if (this.src != '{node_info.image}.png') this.src = '{node_info.image}.png'" />
                     <h4>Signature</h4>
@@ -1,3 +1,2 @@
 from .. import noderegistrar
-noderegistrar.register_node_types('Geometry')
-from ..noderegistrar import *
\ No newline at end of file
+__getattr__ = noderegistrar.lazy_module_getattr(globals(),'Geometry')
\ No newline at end of file
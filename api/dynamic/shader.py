@@ -1,3 +1,2 @@
 from .. import noderegistrar
-noderegistrar.register_node_types('Shader')
-from ..noderegistrar import *
\ No newline at end of file
+__getattr__ = noderegistrar.lazy_module_getattr(globals(),'Shader')
\ No newline at end of file
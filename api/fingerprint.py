@@ -0,0 +1,122 @@
+import bpy
+import enum
+import types
+import os
+import sys
+import hashlib
+from functools import partial
+from . import cache
+
+addon_package = __package__.split('.')[0]
+fingerprint_property = 'nodetree_script_fingerprint'
+
+builtin_packages = (addon_package, 'builtins', 'bpy', 'mathutils', 'math', 'typing', 'enum', 'functools')
+# Source hashes of modules by path, modification time and size.
+module_hashes = {}
+
+def is_addon_or_builtin(value):
+    module = getattr(value, '__module__', None) or ''
+    return module.split('.')[0] in builtin_packages
+
+def code_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+def code_fingerprint(code):
+    return (
+        code.co_code,
+        code.co_names,
+        tuple( code_fingerprint(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts ),
+    )
+
+def module_fingerprint(module, seen):
+    # Modules of the script are fingerprinted by their source, so that editing a helper module rebuilds the trees using it.
+    package = module.__name__.split('.')[0]
+    if package in builtin_packages or package in getattr(sys, 'stdlib_module_names', ()):
+        return ('module', module.__name__)
+    path = getattr(module, '__file__', None)
+    if path:
+        try:
+            stat = os.stat(path)
+            key = (path, stat.st_mtime_ns, stat.st_size)
+            if key not in module_hashes:
+                with open(path, 'rb') as f:
+                    module_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+            return ('module', module.__name__, module_hashes[key])
+        except OSError:
+            pass
+    members = { name: value for name, value in vars(module).items() if getattr(value, '__module__', None) == module.__name__ }
+    return ('module', module.__name__, value_fingerprint(members, seen))
+
+def function_fingerprint(func, seen):
+    code = func.__code__
+    referenced_globals = {
+        name: value_fingerprint(func.__globals__[name], seen)
+        for name in sorted(code_names(code)) if name in func.__globals__
+    }
+    closure = tuple( value_fingerprint(cell.cell_contents, seen) for cell in func.__closure__ or () )
+    return (
+        'function',
+        func.__qualname__,
+        code_fingerprint(code),
+        value_fingerprint(func.__defaults__, seen),
+        value_fingerprint(func.__kwdefaults__, seen),
+        value_fingerprint(func.__annotations__, seen),
+        closure,
+        referenced_globals,
+    )
+
+def value_fingerprint(value, seen):
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, enum.Enum)):
+        return repr(value)
+    if id(value) in seen:
+        return ('cycle', type(value).__qualname__)
+    seen = seen | {id(value)}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple( value_fingerprint(item, seen) for item in value )
+        return (type(value).__name__, tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items)
+    elif isinstance(value, dict):
+        return ('dict', tuple( (repr(k), value_fingerprint(v, seen)) for k, v in value.items() ))
+    elif isinstance(value, types.ModuleType):
+        return module_fingerprint(value, seen)
+    elif hasattr(value, 'tobytes') and hasattr(value, 'shape') and hasattr(value, 'dtype'):
+        # Arrays (e.g. NumPy arrays) are hashed by content: their repr is truncated.
+        return ('array', type(value).__qualname__, str(value.dtype), tuple(value.shape), hashlib.sha256(value.tobytes()).hexdigest())
+    elif isinstance(value, bpy.types.ID):
+        return ('ID', repr(value), value.get(fingerprint_property))
+    elif isinstance(value, types.MethodType):
+        from .nodetree import NodeTree
+        if isinstance(value.__self__, NodeTree):
+            return ('group', value.__self__.node_tree_name, value.__self__._node_tree.get(fingerprint_property))
+        return ('method', value_fingerprint(value.__func__, seen), type(value.__self__).__qualname__)
+    elif isinstance(value, partial):
+        return ('partial', value_fingerprint(value.func, seen), value_fingerprint(value.args, seen), value_fingerprint(value.keywords, seen))
+    elif isinstance(value, type):
+        if is_addon_or_builtin(value):
+            return ('type', value.__module__, value.__qualname__)
+        return ('type', value.__qualname__, value_fingerprint({ k: v for k, v in vars(value).items() if not k.startswith('__') or k == '__annotations__' }, seen))
+    elif isinstance(value, types.FunctionType):
+        if is_addon_or_builtin(value):
+            return ('function', value.__module__, value.__qualname__)
+        return function_fingerprint(value, seen)
+    elif callable(value) and is_addon_or_builtin(value):
+        return ('callable', getattr(value, '__module__', None), getattr(value, '__qualname__', type(value).__qualname__))
+    elif hasattr(value, '__dict__'):
+        return ('object', type(value).__qualname__, value_fingerprint(vars(value), seen))
+    else:
+        return ('object', type(value).__qualname__, repr(value))
+
+def builder_fingerprint(builder, *extra):
+    """
+    Hash of everything a tree builder depends on: its bytecode, constants, defaults, annotations, closure,
+    the globals it references (recursing into functions of the script) and the stored versions of the node groups it calls.
+    """
+    return cache.make_key(
+        tuple(bpy.app.version),
+        cache.addon_source_hash(),
+        value_fingerprint(builder, frozenset()),
+        value_fingerprint(extra, frozenset()),
+    )
@@ -0,0 +1,100 @@
+import math
+
+# Python equivalents of the Math and Vector Math node operations, following the node implementations
+# (e.g. division by zero returns zero) so that folded values match the values computed by Blender.
+
+def safe_divide(a, b):
+    return a / b if b != 0 else 0.0
+
+def safe_power(a, b):
+    if a >= 0 or float(b).is_integer():
+        return math.pow(a, b)
+    return 0.0
+
+def safe_modulo(a, b):
+    return math.fmod(a, b) if b != 0 else 0.0
+
+def floored_modulo(a, b):
+    return a - math.floor(a / b) * b if b != 0 else 0.0
+
+math_operations = {
+    'ADD': lambda a, b: a + b,
+    'SUBTRACT': lambda a, b: a - b,
+    'MULTIPLY': lambda a, b: a * b,
+    'DIVIDE': safe_divide,
+    'MULTIPLY_ADD': lambda a, b, c: a * b + c,
+    'POWER': safe_power,
+    'SQRT': lambda a: math.sqrt(a) if a > 0 else 0.0,
+    'ABSOLUTE': abs,
+    'MINIMUM': min,
+    'MAXIMUM': max,
+    'LESS_THAN': lambda a, b: float(a < b),
+    'GREATER_THAN': lambda a, b: float(a > b),
+    'SIGN': lambda a: float((a > 0) - (a < 0)),
+    'ROUND': lambda a: math.floor(a + 0.5),
+    'FLOOR': math.floor,
+    'CEIL': math.ceil,
+    'TRUNC': math.trunc,
+    'FRACT': lambda a: a - math.floor(a),
+    'MODULO': safe_modulo,
+    'FLOORED_MODULO': floored_modulo,
+    'SINE': math.sin,
+    'COSINE': math.cos,
+    'TANGENT': math.tan,
+    'RADIANS': math.radians,
+    'DEGREES': math.degrees,
+}
+
+def componentwise(function):
+    return lambda *vectors: tuple( function(*components) for components in zip(*vectors) )
+
+def dot(a, b):
+    return sum( x * y for x, y in zip(a, b) )
+
+def normalize(a):
+    length = math.sqrt(dot(a, a))
+    return tuple( x / length for x in a ) if length != 0 else (0.0, 0.0, 0.0)
+
+vector_operations = {
+    'ADD': componentwise(math_operations['ADD']),
+    'SUBTRACT': componentwise(math_operations['SUBTRACT']),
+    'MULTIPLY': componentwise(math_operations['MULTIPLY']),
+    'DIVIDE': componentwise(safe_divide),
+    'MULTIPLY_ADD': componentwise(math_operations['MULTIPLY_ADD']),
+    'MINIMUM': componentwise(min),
+    'MAXIMUM': componentwise(max),
+    'ABSOLUTE': componentwise(abs),
+    'FLOOR': componentwise(math.floor),
+    'CEIL': componentwise(math.ceil),
+    'FRACT': componentwise(math_operations['FRACT']),
+    'MODULO': componentwise(safe_modulo),
+    'DOT_PRODUCT': dot,
+    'CROSS_PRODUCT': lambda a, b: (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]),
+    'LENGTH': lambda a: math.sqrt(dot(a, a)),
+    'DISTANCE': lambda a, b: math.sqrt(sum( (x - y) ** 2 for x, y in zip(a, b) )),
+    'NORMALIZE': normalize,
+}
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def fold(operation, operands, vector_like):
+    """
+    Value of a Math (or Vector Math if `vector_like`) operation on constant operands, or None if it cannot be computed at build time.
+    """
+    if vector_like:
+        function = vector_operations.get(operation)
+        operands = [ (float(operand),) * 3 if is_number(operand) else operand for operand in operands ]
+        if not all( isinstance(operand, tuple) and len(operand) == 3 and all(map(is_number, operand)) for operand in operands ):
+            return None
+    else:
+        function = math_operations.get(operation)
+        if not all(map(is_number, operands)):
+            return None
+    if function is None:
+        return None
+    try:
+        result = function(*operands)
+    except Exception:
+        return None
+    return tuple(map(float, result)) if isinstance(result, tuple) else float(result)
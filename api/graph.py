@@ -0,0 +1,147 @@
+class GraphSocket:
+    """
+    A socket of a `GraphNode`.
+
+    Attributes are read from the matching socket of the template node, and from the socket of the created node once the graph is flushed.
+    Default values are validated against the template socket and recorded on the graph node until it is flushed.
+    """
+    def __init__(self, node, index, is_output, template):
+        self.node = node
+        self.index = index
+        self.is_output = is_output
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    @property
+    def default_value(self):
+        return self.node.default_values.get((self.is_output, self.index), self.template.default_value)
+
+    @default_value.setter
+    def default_value(self, value):
+        if self.node.node is not None:
+            self.template.default_value = value
+            return
+        # The template is shared by every node with the same type and properties: its value is restored once validated.
+        previous = self.template.default_value
+        if hasattr(previous, '__len__') and not isinstance(previous, str):
+            previous = tuple(previous)
+        self.template.default_value = value
+        self.template.default_value = previous
+        self.node.default_values[(self.is_output, self.index)] = value
+
+class GraphNode:
+    """
+    A node recorded by a `Graph`.
+
+    Setting an attribute records a node property. The sockets come from a template node with the same properties.
+    """
+    def __init__(self, graph, bl_idname):
+        self.__dict__.update(
+            graph=graph,
+            bl_idname=bl_idname,
+            name=bl_idname,
+            properties={},
+            default_values={},
+            callbacks=[],
+            node=None,
+            wrappers=[],
+            _sockets=None,
+        )
+
+    def __setattr__(self, name, value):
+        self.properties[name] = value
+        self.__dict__['_sockets'] = None
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['properties'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @property
+    def template(self):
+        if self.node is not None:
+            return self.node
+        return self.graph.template(self.bl_idname, self.properties)
+
+    @property
+    def sockets(self):
+        if self._sockets is None:
+            template = self.template
+            self.__dict__['_sockets'] = (
+                [ GraphSocket(self, i, False, socket) for i, socket in enumerate(template.inputs) ],
+                [ GraphSocket(self, i, True, socket) for i, socket in enumerate(template.outputs) ],
+            )
+            self.wrappers.extend(self._sockets[0] + self._sockets[1])
+        return self._sockets
+
+    @property
+    def inputs(self):
+        return self.sockets[0]
+
+    @property
+    def outputs(self):
+        return self.sockets[1]
+
+class Graph:
+    """
+    Nodes and links recorded while a tree is built in deferred mode.
+
+    Nothing is added to the node tree until `flush`, which creates every node and link in a single pass.
+    Templates, one node per node type and set of properties, are created in a separate tree to know the sockets of the recorded nodes.
+    """
+    def __init__(self, template_tree):
+        self.template_tree = template_tree
+        self.templates = {}
+        self.nodes = []
+        self.links = []
+
+    def template(self, bl_idname, properties):
+        key = (bl_idname, tuple( (identifier, repr(value)) for identifier, value in properties.items() ))
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = self.template_tree.nodes.new(bl_idname)
+            for identifier, value in properties.items():
+                setattr(template, identifier, value)
+        return template
+
+    def new_node(self, bl_idname):
+        node = GraphNode(self, bl_idname)
+        self.nodes.append(node)
+        return node
+
+    def link(self, from_socket, to_socket):
+        self.links.append((from_socket, to_socket))
+
+    @staticmethod
+    def resolve(socket):
+        if isinstance(socket, GraphSocket):
+            node = socket.node.node
+            return (node.outputs if socket.is_output else node.inputs)[socket.index]
+        return socket
+
+    def flush(self, node_tree):
+        for graph_node in self.nodes:
+            node = node_tree.nodes.new(graph_node.bl_idname)
+            for identifier, value in graph_node.properties.items():
+                setattr(node, identifier, value)
+            for (is_output, index), value in graph_node.default_values.items():
+                (node.outputs if is_output else node.inputs)[index].default_value = value
+            for callback in graph_node.callbacks:
+                callback(node)
+            graph_node.__dict__['node'] = node
+            # Sockets still held by the script forward to the created node instead of the templates, which are removed after the flush.
+            for socket in graph_node.wrappers:
+                sockets = node.outputs if socket.is_output else node.inputs
+                if socket.index < len(sockets):
+                    socket.template = sockets[socket.index]
+        for from_socket, to_socket in self.links:
+            node_tree.links.new(Graph.resolve(from_socket), Graph.resolve(to_socket))
+
+def socket_identity(socket):
+    # Hashable identity of a Blender socket or of a `GraphSocket`, valid during a build.
+    if isinstance(socket, GraphSocket):
+        return ('graph', id(socket.node), socket.is_output, socket.index)
+    return socket.as_pointer()
@@ -0,0 +1,44 @@
+from collections import defaultdict, deque
+
+# Minimal edits turning the sockets of a node tree interface into the sockets requested by a builder.
+# Sockets that are kept keep their identifier, so the values set on modifiers and group nodes using the tree are preserved.
+
+def plan_interface(current, desired, can_retype=True):
+    """
+    Match the `desired` sockets with the `current` ones, both given as lists of `(name, socket_type)`.
+
+    Sockets are matched by name and type first, then by name only when sockets can be retyped, and then by type (renamed sockets).
+    Returns the index of the current socket reused by every desired socket (None for sockets to add) and the indices of the sockets to remove.
+    """
+    matches = [None] * len(desired)
+    used = set()
+
+    def match(key):
+        candidates = defaultdict(deque)
+        for j, socket in enumerate(current):
+            if j not in used:
+                candidates[key(socket)].append(j)
+        for i, socket in enumerate(desired):
+            if matches[i] is None and candidates[key(socket)]:
+                matches[i] = candidates[key(socket)].popleft()
+                used.add(matches[i])
+
+    match(lambda socket: socket)
+    if can_retype:
+        match(lambda socket: socket[0])
+    match(lambda socket: socket[1])
+    removed = [ j for j in range(len(current)) if j not in used ]
+    return matches, removed
+
+def plan_moves(order, target):
+    """
+    Moves `(from_index, to_index)` reordering the list of keys `order` into `target`, moving each key up at most once.
+    """
+    order = list(order)
+    moves = []
+    for i, key in enumerate(target):
+        if order[i] != key:
+            j = order.index(key, i)
+            order.insert(i, order.pop(j))
+            moves.append((j, i))
+    return moves
@@ -1,17 +1,26 @@
 from collections import defaultdict
+from functools import partial
 import enum
+import bpy
 from .state import State
+from .graph import GraphSocket
 from .static.curve import Curve
-from .util import lower_snake_case, get_unique_subclass_properties, _as_iterable, enabled_sockets
+from .util import lower_snake_case, get_property_infos, _as_iterable, Attrs
 from .static.input_group import InputGroup
 
 class NodeOutputs(dict):
+    # Output sockets by name. Sockets given to the constructor are only wrapped in a `NodeSocket` once they are accessed,
+    # with the socket class of the tree being built when the outputs were created.
+    __slots__ = ('_keys', '_socket_class')
+
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        dict_copy = list(self.items())
-        self.clear()
-        for key,value in dict_copy:
-            self[key] = value
+        super().__init__()
+        object.__setattr__(self, '_keys', None)
+        object.__setattr__(self, '_socket_class', State.NodeSocket)
+        for key,value in dict(*args, **kwargs).items():
+            if not isinstance(value, (self._socket_class, GraphSocket, bpy.types.NodeSocket)):
+                value = self._socket_class.create(value)
+            super().__setitem__(lower_snake_case(key), value)
     @classmethod
     def create(cls, value):
         if isinstance(value, cls):
@@ -28,29 +37,70 @@ class NodeOutputs(dict):
         return cls(outputs)
 
     def __getitem__(self, key):
-        return list(self.values())[key] if isinstance(key, int) else  super().__getitem__(key)
+        if isinstance(key, int):
+            if self._keys is None:
+                object.__setattr__(self, '_keys', tuple(self.keys()))
+            key = self._keys[key]
+        value = super().__getitem__(key)
+        if not isinstance(value, self._socket_class):
+            value = self._socket_class(value)
+            super().__setitem__(key, value)
+        return value
     def __iter__(self):
         return iter(self.values())
     def __setitem__(self,key,value):
-        key = lower_snake_case(key)
-        value = State.NodeSocket.create(value)
-        super().__setitem__(key, value)
+        super().__setitem__(lower_snake_case(key), self._socket_class.create(value))
+        object.__setattr__(self, '_keys', None)
     def __setattr__(self,name,value):
         self[name] = value
 
-    __getattr__ = dict.get
+    def _wrap_all(self):
+        for key in self.keys():
+            self[key]
+    def values(self):
+        self._wrap_all()
+        return super().values()
+    def items(self):
+        self._wrap_all()
+        return super().items()
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    __getattr__ = get
     __delattr__ = dict.__delitem__
 
-def set_or_create_link(value,node_input):
-    try:
-        node_input.default_value = value
-    except:
-        State.current_node_tree.link(State.NodeSocket.create(value)._socket, node_input)
+def set_or_create_link(value,node_input,accepts_literal=True):
+    if accepts_literal:
+        try:
+            node_input.default_value = value
+            return
+        except:
+            pass
+    State.current_node_tree.link(State.NodeSocket.create(value)._socket, node_input)
+
+class BuildPlan:
+    # Enabled sockets of a node type for a given set of property values.
+    # Compiled from the first node built with these values and reused for every following one.
+    def __init__(self,node):
+        self.inputs = defaultdict(list)
+        for i, node_input in enumerate(node.inputs):
+            if node_input.enabled:
+                self.inputs[lower_snake_case(node_input.name)].append(
+                    Attrs(index=i, is_multi_input=node_input.is_multi_input, accepts_literal=hasattr(node_input,'default_value'))
+                )
+        self.outputs = [ (i, node_output.name) for i, node_output in enumerate(node.outputs) if node_output.enabled ]
 
 class Node:
-    def __init__(self,node_type):
-        self._node = State.current_node_tree.new_node(node_type.__name__)
-        self.type = type(self._node)
+    __slots__ = ('_node', 'is_reused', 'type', 'property_state', 'plan', 'outputs')
+    build_plans = {}
+    plan_property_types = ('ENUM', 'BOOLEAN')
+
+    def __init__(self,node_type,key=None):
+        existing_node = State.current_node_tree.claim_node(key)
+        self.is_reused = existing_node is not None
+        self._node = existing_node if self.is_reused else State.current_node_tree.new_node(node_type.__name__,key)
+        self.type = node_type
+        self.property_state = []
 
     @staticmethod
     def build_node(primary_arg=None,node_type=None,get_socket_if_singular_output=True,return_node=False,**kwargs):
@@ -59,11 +109,17 @@ class Node:
                 kwargs.update(v.__dict__)
                 del kwargs[k]
 
-        node = Node(node_type)
-        if primary_arg:
-            node.set_primary_arg(primary_arg)
-        kwargs=node.set_properties(**kwargs)
-        node.set_inputs(**kwargs)
+        properties, kwargs = Node.split_properties(node_type,kwargs)
+        key = State.current_node_tree.node_key(node_type, primary_arg, [(prop.identifier, value) for prop, value in properties], sorted(kwargs.items()))
+        node = Node(node_type,key)
+        if not node.is_reused:
+            if primary_arg:
+                node.set_primary_arg(primary_arg)
+            node.set_properties(properties)
+        node.property_state = Node.get_property_state(properties)
+        node.plan = node.get_build_plan()
+        if not node.is_reused:
+            node.set_inputs(**kwargs)
 
         node.outputs = node.get_outputs()
         if return_node:
@@ -76,36 +132,65 @@ class Node:
     def set_primary_arg(self,primary_arg):
         State.current_node_tree.link(primary_arg._socket, self._node.inputs[0])
 
-    def set_properties(self,**kwargs):
-        for prop in get_unique_subclass_properties(self.type):
-            argname = lower_snake_case(prop.identifier)
-            value = kwargs.pop(argname,None)
-            if value is not None:
-                if isinstance(value, list) and len(value) > 0 and isinstance(value[0], Curve):
-                    for i, curve in enumerate(value):
-                        curve.apply(getattr(self._node, prop.identifier).curves[i])
-                    continue
-                elif isinstance(value, Curve):
-                    value.apply(getattr(self._node, prop.identifier).curves[0])
-                    continue
-                elif isinstance(value, enum.Enum):
-                    value = value.value
-
-                setattr(self._node, prop.identifier, value)
-        return kwargs
+    @staticmethod
+    def split_properties(node_type,kwargs):
+        properties = []
+        if kwargs:
+            for prop in get_property_infos(node_type):
+                value = kwargs.pop(prop.argname,None)
+                if value is not None:
+                    properties.append((prop, value))
+        return properties, kwargs
 
-    def set_inputs(self,**kwargs):
-        node_input_lists = defaultdict(list)
-        for node_input in enabled_sockets(self._node.inputs):
-            argname = lower_snake_case(node_input.name)
-            node_input_lists[argname].append(node_input)
+    @staticmethod
+    def get_property_state(properties):
+        property_state = []
+        for prop, value in properties:
+            if isinstance(value, Curve) or (isinstance(value, list) and len(value) > 0 and isinstance(value[0], Curve)):
+                continue
+            property_state.append((prop.identifier, prop.type, value.value if isinstance(value, enum.Enum) else value))
+        return property_state
+
+    def set_properties(self,properties):
+        for prop, value in properties:
+            if isinstance(value, Curve) or (isinstance(value, list) and len(value) > 0 and isinstance(value[0], Curve)):
+                State.current_node_tree.configure_node(self._node, partial(Node.apply_curves, prop.identifier, value if isinstance(value, list) else [value]))
+                continue
+            elif isinstance(value, enum.Enum):
+                value = value.value
+
+            setattr(self._node, prop.identifier, value)
+
+    @staticmethod
+    def apply_curves(identifier,curves,node):
+        for i, curve in enumerate(curves):
+            curve.apply(getattr(node, identifier).curves[i])
+
+    def get_build_plan(self):
+        # Properties such as node groups change the sockets independently of their value, so only plain values are cached.
+        # Of those, only enums and booleans turn sockets on and off: other values share a plan instead of adding one per value.
+        if not all( isinstance(value, (bool,int,float,str,tuple)) for _, _, value in self.property_state ):
+            return BuildPlan(self._node)
+        socket_state = tuple( (identifier, value) for identifier, prop_type, value in self.property_state if prop_type in Node.plan_property_types )
+        key = (State.current_node_tree.node_tree_type, self.type, socket_state)
+        try:
+            plan = Node.build_plans.get(key)
+        except TypeError:
+            return BuildPlan(self._node)
+        if plan is None:
+            plan = Node.build_plans[key] = BuildPlan(self._node)
+        return plan
 
+    def set_inputs(self,**kwargs):
+        node_inputs = self._node.inputs
         for argname,value in kwargs.items():
-            self.validate_argname(argname,node_input_lists)
-            node_input_list = node_input_lists[argname]
-            values,node_input_list = self.handle_iterable_inputs(value,node_input_list)
-            for value,node_input in zip(values,node_input_list):
-                set_or_create_link(value,node_input)
+            self.validate_argname(argname,self.plan.inputs)
+            input_plans = self.plan.inputs[argname]
+            values,input_plans = self.handle_iterable_inputs(value,input_plans)
+            for value,input_plan in zip(values,input_plans):
+                value = State.NodeSocket.unwrap_constant(value)
+                accepts_literal = input_plan.accepts_literal and not isinstance(value, State.NodeSocket)
+                set_or_create_link(value,node_inputs[input_plan.index],accepts_literal)
 
     def validate_argname(self,argname,node_input_lists):
         if argname not in node_input_lists:
@@ -124,16 +209,17 @@ class Node:
         return values,node_input_list
 
     def get_outputs(self):
-        return NodeOutputs( {socket.name:socket for socket in enabled_sockets(self._node.outputs)} )
+        node_outputs = self._node.outputs
+        return NodeOutputs( {name:node_outputs[i] for i, name in self.plan.outputs} )
 
 class GeometryNode(Node):
-    pass
+    __slots__ = ()
 class ShaderNode(Node):
-    pass
+    __slots__ = ()
 class CompositorNode(Node):
-    pass
+    __slots__ = ()
 class FunctionNode(Node):
-    pass
+    __slots__ = ()
 class TextureNode(Node):
-    pass
+    __slots__ = ()
 
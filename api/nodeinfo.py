@@ -0,0 +1,51 @@
+from collections import defaultdict
+from .util import lower_snake_case, title_case
+
+
+class NodeInfo():
+    def __init__(self, node_type):
+        self.type = node_type
+        self.type_name = node_type.__name__
+        self.label = node_type.bl_rna.name
+        if node_type.bl_rna.name == "Group":
+            name = node_type.bl_rna.identifier
+        else:
+            name = node_type.bl_rna.name
+        self.func_name = lower_snake_case(name)
+        self.namespace = title_case(name)
+        self.outputs = {}
+        self.primary_arg = None
+        self.default_value = defaultdict(lambda: defaultdict(list))
+        self.input_index = {}
+        self.enums = {}
+
+    def to_dict(self):
+        return {
+            'type': self.type_name,
+            'label': self.label,
+            'func_name': self.func_name,
+            'namespace': self.namespace,
+            'outputs': dict(self.outputs),
+            'primary_arg': self.primary_arg,
+            'default_value': { argname: dict(types) for argname, types in self.default_value.items() },
+            'input_index': dict(self.input_index),
+            'enums': dict(self.enums),
+        }
+
+    @classmethod
+    def from_dict(cls, data, node_type=None):
+        # `node_type` is None when the info is read outside of Blender.
+        node_info = cls.__new__(cls)
+        node_info.type = node_type
+        node_info.type_name = data['type']
+        node_info.label = data['label']
+        node_info.func_name = data['func_name']
+        node_info.namespace = data['namespace']
+        node_info.outputs = data['outputs']
+        node_info.primary_arg = data['primary_arg']
+        node_info.default_value = defaultdict(lambda: defaultdict(list))
+        for argname, types in data['default_value'].items():
+            node_info.default_value[argname].update(types)
+        node_info.input_index = data['input_index']
+        node_info.enums = data['enums']
+        return node_info
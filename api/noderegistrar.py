@@ -3,26 +3,15 @@ import enum
 from functools import partial, partialmethod
 from collections import defaultdict
 from . import nodesocket
+from . import cache
 from .nodetree import NodeTree
 from .node import Node
-from .util import lower_snake_case, title_case, upper_snake_case, get_bpy_subclasses, get_unique_subclass_properties, _as_iterable
-import mathutils
+from .state import State
+from .nodeinfo import NodeInfo
+from . import snapshot
+from .util import lower_snake_case, title_case, upper_snake_case, get_bpy_subclasses, get_property_infos, _as_iterable, _as_plain_value
 
 
-class NodeInfo():
-    def __init__(self, node_type):
-        self.type = node_type
-        if node_type.bl_rna.name == "Group":
-            name = node_type.bl_rna.identifier
-        else:
-            name = node_type.bl_rna.name
-        self.func_name = lower_snake_case(name)
-        self.namespace = title_case(name)
-        self.outputs = {}
-        self.primary_arg = None
-        self.default_value = defaultdict(lambda: defaultdict(list))
-        self.input_index = {}
-
 class NodeRegistrar:
     enum_socket_type = {}
     socket_type_with_none_subtype = {}
@@ -35,52 +24,100 @@ class NodeRegistrar:
         self.node_infos=[]
         self.enums = defaultdict(list)
         self.math_funcs = []
+        self.exports = {}
 
     @staticmethod
     def remove_socket_subtype(socket_type):
         return NodeRegistrar.socket_type_with_none_subtype[NodeRegistrar.enum_socket_type[socket_type]]
 
-    def register_node_types(self,node_types,node_tree_type):
-        self.node_tree=NodeTree.node_trees.new('temp_node_tree', f"{node_tree_type}NodeTree")
+    def set_node_tree_type(self,node_tree_type):
+        self.node_tree_type = node_tree_type
         self.node_socket_class = getattr(nodesocket, f"{node_tree_type}NodeSocket")
-        for node_type in node_types:
-            self.register_node_type(node_type)
+
+    def create_temp_node_tree(self):
+        self.node_tree=NodeTree.node_trees.new('temp_node_tree', f"{self.node_tree_type}NodeTree")
+
+    def register_node_types_from_dict(self,data,node_types):
+        self.set_node_tree_type(data['node_tree_type'])
+        NodeRegistrar.enum_socket_type.update(data['enum_socket_type'])
+        NodeRegistrar.socket_type_with_none_subtype.update(data['socket_type_with_none_subtype'])
+        node_types_by_name = { node_type.__name__: node_type for node_type in node_types }
+        for node_info_data in data['node_infos']:
+            self.register_node_info(NodeInfo.from_dict(node_info_data, node_types_by_name[node_info_data['type']]))
         self.add_math_functions()
-        self.clean_up()
+
+    def to_dict(self):
+        return {
+            'node_tree_type': self.node_tree_type,
+            'node_infos': [ node_info.to_dict() for node_info in self.node_infos ],
+            'math_funcs': list(self.math_funcs),
+            'enum_socket_type': dict(NodeRegistrar.enum_socket_type),
+            'socket_type_with_none_subtype': dict(NodeRegistrar.socket_type_with_none_subtype),
+        }
 
     def register_node_type(self,node_type):
         try:
             self.node_instance = self.node_tree.nodes.new(node_type.__name__)
         except:
-            return
+            return None
         self.node_info = NodeInfo(node_type)
         self.make_node_build_function()
         self.make_node_build_for_nodesocket_fluent_interface()
         self.parse_node_properties()
         self.parse_node_inputs()
         self.parse_node_outputs()
+        self.add_node_info()
+        return self.node_info
+
+    def register_node_info(self,node_info):
+        self.node_info = node_info
+        self.make_node_build_function()
+        self.make_node_build_for_nodesocket_fluent_interface()
+        for enum_name, enum_cases in self.node_info.enums.items():
+            self.add_enum(enum_name, enum_cases)
+        self.add_node_info()
+
+    def supports_node_type(self,node_type):
+        # The node class decides which trees it can be added to.
+        try:
+            return bool(node_type.poll(self.node_tree))
+        except:
+            pass
+        try:
+            node = self.node_tree.nodes.new(node_type.__name__)
+        except:
+            return False
+        self.node_tree.nodes.remove(node)
+        return True
+
+    def add_node_info(self):
         self.node_infos.append(self.node_info)
-        NodeRegistrar.all_node_info[node_type] = self.node_info
+        NodeRegistrar.all_node_info[self.node_info.type] = self.node_info
+
+    def export(self,name,value):
+        globals()[name] = value
+        self.exports[name] = value
 
     def make_node_build_function(self):
         func = partial(Node.build_node,primary_arg=None,node_type=self.node_info.type)
-        globals()[self.node_info.func_name] = func
+        self.export(self.node_info.func_name, func)
 
     def make_node_build_for_nodesocket_fluent_interface(self):
         method = partialmethod(Node.build_node, node_type=self.node_info.type)
         setattr( self.node_socket_class, self.node_info.func_name,  method)
 
     def parse_node_properties(self):
-        for node_prop in get_unique_subclass_properties(self.node_info.type):
+        for node_prop in get_property_infos(self.node_info.type):
             argname = node_prop.identifier
             if node_prop.type == 'ENUM':
                 typename = self.create_enum(node_prop)
             else:
-                typename = node_prop.type.title()
+                typename = node_prop.typename
 
-            default_value = getattr(self.node_instance,node_prop.identifier)
-            if type(default_value) == mathutils.Vector:
-                default_value = tuple(default_value)
+            if node_prop.type in ['POINTER','COLLECTION']:
+                default_value = None
+            else:
+                default_value = _as_plain_value(getattr(self.node_instance,node_prop.identifier))
             self.node_info.input_index[node_prop.identifier] = len(self.node_info.default_value[argname][typename])
             self.node_info.default_value[argname][typename].append(default_value)
 
@@ -113,12 +150,17 @@ class NodeRegistrar:
             self.node_info.outputs[outputname] = typename
 
     def create_enum(self,prop):
-        enum_name = title_case(prop.identifier)
-        enum_cases = { upper_snake_case(enum_item.identifier): enum_item.identifier for enum_item in prop.enum_items }
+        enum_name = prop.enum_name
+        enum_cases = { upper_snake_case(enum_item): enum_item for enum_item in prop.enum_items }
+        self.node_info.enums[enum_name] = enum_cases
+        return self.add_enum(enum_name, enum_cases)
+
+    def add_enum(self,enum_name,enum_cases):
         enum_type = enum.Enum(enum_name, enum_cases)
 
         if self.node_info.namespace not in globals():
             globals()[self.node_info.namespace] = type(self.node_info.namespace, (), {})
+        self.export(self.node_info.namespace, globals()[self.node_info.namespace])
         setattr(globals()[self.node_info.namespace], enum_name, enum_type)
         self.enums[self.node_info.namespace].append(enum_type)
 
@@ -127,14 +169,21 @@ class NodeRegistrar:
     math_aliases= {'cosine':'cos','sine':'sin','tangent':'tan',
                 'arcsine':'asin','arccosine':'acos','arctangent':'atan','arctan2':'atan2'}
     def add_math_functions(self):
-        operations = list(Math.Operation.__members__) + list(VectorMath.Operation.__members__)
+        math = self.exports.get('math')
+        vector_math = self.exports.get('vector_math')
+        operations = []
+        if math is not None:
+            operations += list(self.exports['Math'].Operation.__members__)
+        if vector_math is not None:
+            operations += list(self.exports['VectorMath'].Operation.__members__)
         for operation in operations:
             if lower_snake_case(operation) not in ['compare']:
-                globals()[lower_snake_case(operation)]= partial(NodeRegistrar._math,operation=operation,math=math,vector_math=vector_math)
+                self.export(lower_snake_case(operation), partial(NodeRegistrar._math,operation=operation,math=math,vector_math=vector_math))
                 self.math_funcs.append(lower_snake_case(operation))
         for name,alias in self.__class__.math_aliases.items():
-            globals()[alias]=globals()[name]
-            self.math_funcs.append(alias)
+            if name in self.exports:
+                self.export(alias, self.exports[name])
+                self.math_funcs.append(alias)
 
     @staticmethod
     def _math(*vectors_or_values,operation=None,math=None,vector_math=None):
@@ -142,9 +191,12 @@ class NodeRegistrar:
         if type(vectors_or_values[0]) == tuple:
             vector_like = True
         elif isinstance(vectors_or_values[0],nodesocket.NodeSocket):
-            vector_like = vectors_or_values[0]._socket.type in  ['VECTOR','RGBA']
+            vector_like = vectors_or_values[0].is_vector_like()
         else:
             vector_like = False
+        folded = State.NodeSocket.fold_math(operation, vectors_or_values, vector_like)
+        if folded is not None:
+            return folded
         if len(vectors_or_values) == 1:
             vectors_or_values = vectors_or_values[0]
         if vector_like:
@@ -156,6 +208,8 @@ class NodeRegistrar:
         NodeTree.node_trees.remove(self.node_tree)
 
 
+node_tree_types = ['Geometry','Shader','Texture','Compositor']
+
 def collect_node_types_to_register():
     node_types_to_register = []
     for node_type in get_bpy_subclasses(bpy.types.Node):
@@ -163,8 +217,77 @@ def collect_node_types_to_register():
             node_types_to_register.append(node_type)
     return node_types_to_register
 
+def registry_cache_key(node_tree_type,node_types):
+    return cache.make_key(
+        node_tree_type,
+        tuple(bpy.app.version),
+        bpy.app.build_hash,
+        cache.addon_source_hash(),
+        tuple(sorted(node_type.__name__ for node_type in node_types))
+    )
+
+def register_tree_node_types(node_types,node_tree_type):
+    # Registrar of the node types supported by a single tree type.
+    # Node classes parsed by an earlier registrar are reused from `NodeRegistrar.all_node_info` instead of being parsed again.
+    nr = NodeRegistrar()
+    nr.set_node_tree_type(node_tree_type)
+    nr.create_temp_node_tree()
+    for node_type in node_types:
+        if not nr.supports_node_type(node_type):
+            continue
+        node_info = NodeRegistrar.all_node_info.get(node_type)
+        if node_info is None:
+            nr.register_node_type(node_type)
+        else:
+            nr.register_node_info(node_info)
+    nr.add_math_functions()
+    nr.clean_up()
+    return nr
+
+node_registrars = {}
+
 def register_node_types(node_tree_type):
     node_types_to_register = collect_node_types_to_register()
-    nr = NodeRegistrar()
-    nr.register_node_types(node_types_to_register,node_tree_type)
-    return nr
\ No newline at end of file
+    cache_name = f"{node_tree_type.lower()}_registry"
+    cached_registry = cache.load(cache_name,registry_cache_key(node_tree_type,node_types_to_register))
+    if cached_registry is not None:
+        nr = NodeRegistrar()
+        nr.register_node_types_from_dict(cached_registry,node_types_to_register)
+        node_registrars[node_tree_type] = nr
+        return nr
+
+    nr = register_tree_node_types(node_types_to_register,node_tree_type)
+    cache.save(cache_name,registry_cache_key(node_tree_type,node_types_to_register),nr.to_dict())
+    node_registrars[node_tree_type] = nr
+    return nr
+
+def get_node_registrar(node_tree_type):
+    if node_tree_type not in node_registrars:
+        register_node_types(node_tree_type)
+    return node_registrars[node_tree_type]
+
+def registry_snapshot():
+    return {
+        'blender_version': tuple(bpy.app.version),
+        'socket_class_names': [ subclass.__name__ for subclass in nodesocket.NodeSocket.__subclasses__() ],
+        'registrars': { node_tree_type: get_node_registrar(node_tree_type).to_dict() for node_tree_type in node_tree_types },
+    }
+
+def write_registry_snapshot(path):
+    snapshot.write_snapshot(path, registry_snapshot())
+
+def lazy_module_getattr(module_globals,node_tree_type):
+    # Module-level `__getattr__` for the `api.dynamic` modules.
+    # The node functions of a tree type are only registered once a name is first looked up in its module.
+    def __getattr__(name):
+        is_dunder = name.startswith('__') and name.endswith('__')
+        if '__all__' not in module_globals and (name == '__all__' or not is_dunder):
+            nr = get_node_registrar(node_tree_type)
+            exported = { key: value for key, value in globals().items() if not key.startswith('_') }
+            exported.update(nr.exports)
+            module_globals.update(exported)
+            module_globals['__all__'] = list(exported)
+            if name in module_globals:
+                return module_globals[name]
+        raise AttributeError(f"module '{module_globals['__name__']}' has no attribute '{name}'")
+    return __getattr__
\ No newline at end of file
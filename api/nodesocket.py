@@ -2,6 +2,8 @@ import bpy
 import enum
 from .state import State
 from .node import Node
+from .graph import GraphNode, GraphSocket, socket_identity
+from . import fold
 from .static.sample_mode import SampleMode
 from .util import get_bpy_subclasses
 
@@ -28,29 +30,132 @@ class NodeSocket:
         from .dynamic.shader import vector_math
         return vector_math
 
+    __slots__ = ('_node_socket', '_socket_type', '_constant')
+
     def __init__(self, value):
+        self._node_socket = None
+        self._socket_type = None
+        self._constant = None
         if isinstance(value,NodeSocket):
-            self._socket = value._socket
-        elif isinstance(value, bpy.types.NodeSocket):
-            self._socket = value
+            self._constant = value._constant
+            self._node_socket = value._node_socket
+            self._socket_type = value._socket_type
+        elif isinstance(value, (bpy.types.NodeSocket, GraphSocket)):
+            self._node_socket = value
         else:
-            if type(value) is tuple:
-                node_type, property = self.__class__.type_to_node[tuple].get(len(value),(None,None))
-            else:
-                node_type, property= self.__class__.type_to_node.get(type(value),(None,None) )
-
-            if node_type is None:
+            if self.__class__.literal_node(value)[0] is None:
                 raise Exception(f"The {self.__class__.__name__} class cannot express '{value}' of type '{type(value).__name__}' as a node socket")
+            self._constant = value
+            # Literal nodes are only added once needed in trees built with `fold_constants`, so that constants can be folded first.
+            if not getattr(State.current_node_tree, 'fold_constants', False):
+                self.create_literal_node()
 
-            node = Node(node_type)._node
-            if property:
-                setattr(node, property, value)
-            else:
-                 node.outputs[0].default_value = value
+    @property
+    def _socket(self):
+        if self._node_socket is None:
+            self.create_literal_node()
+        return self._node_socket
+
+    @_socket.setter
+    def _socket(self, socket):
+        self._node_socket = socket
+        self._socket_type = None
+
+    @property
+    def socket_type(self):
+        if self._socket_type is None:
+            socket = self._socket
+            self._socket_type = type(socket.template if isinstance(socket, GraphSocket) else socket).__name__
+        return self._socket_type
+
+    @classmethod
+    def literal_node(cls, value):
+        if type(value) is tuple:
+            return cls.type_to_node[tuple].get(len(value),(None,None))
+        else:
+            return cls.type_to_node.get(type(value),(None,None))
+
+    def create_literal_node(self):
+        value = self._constant
+        node_type, property = self.__class__.literal_node(value)
+        # Literal nodes are interned: every socket with the same value shares a single node per tree.
+        literal_key = (self.__class__, node_type, type(value), value)
+        socket = State.current_node_tree.literal_sockets.get(literal_key)
+        if socket is None:
+            node = Node(node_type,State.current_node_tree.node_key(node_type,property,value))
+            if not node.is_reused:
+                if property:
+                    setattr(node._node, property, value)
+                else:
+                     node._node.outputs[0].default_value = value
+            socket = State.current_node_tree.literal_sockets[literal_key] = node._node.outputs[0]
+
+        self._socket = socket
+
+    def is_pending_constant(self):
+        return self._node_socket is None
+
+    @staticmethod
+    def unwrap_constant(value):
+        return value._constant if isinstance(value, NodeSocket) and value.is_pending_constant() else value
+
+    def is_vector_like(self):
+        if self.is_pending_constant():
+            return type(self._constant) is tuple
+        return self._socket.type in ['VECTOR','RGBA']
+
+    @classmethod
+    def constant_value(cls, value):
+        if isinstance(value, NodeSocket):
+            if value._constant is not None:
+                return value._constant
+            node = value._socket.node
+            properties = { node_type.__name__: property for node_type, property in cls.literal_node_types() }
+            if node.bl_idname not in properties:
+                return None
+            property = properties[node.bl_idname]
+            try:
+                if property is None:
+                    # Value nodes hold their value on their output, unless it is driven.
+                    if cls.is_driven(node):
+                        return None
+                    value = node.outputs[0].default_value
+                else:
+                    value = getattr(node, property)
+            except AttributeError:
+                return None
+            return tuple(value) if hasattr(value, '__len__') and not isinstance(value, str) else value
+        elif isinstance(value, (int, float, tuple)):
+            return value
+        return None
+
+    @staticmethod
+    def is_driven(node):
+        if isinstance(node, GraphNode):
+            return len(node.callbacks) > 0
+        animation_data = node.id_data.animation_data
+        return animation_data is not None and animation_data.drivers.find(f'nodes["{node.name}"].outputs[0].default_value') is not None
 
-            self._socket = node.outputs[0]
+    @classmethod
+    def literal_node_types(cls):
+        for key, node in cls.type_to_node.items():
+            if key is tuple:
+                yield from node.values()
+            else:
+                yield node
 
-        self.socket_type = type(self._socket).__name__
+    @classmethod
+    def fold_math(cls, operation, operands, vector_like):
+        # Operations on constants are computed at build time when the tree is built with `fold_constants`.
+        if not getattr(State.current_node_tree, 'fold_constants', False):
+            return None
+        constants = [ cls.constant_value(operand) for operand in operands ]
+        if None in constants:
+            return None
+        result = fold.fold(operation, constants, vector_like)
+        if result is None or cls.literal_node(result)[0] is None:
+            return None
+        return cls(result)
 
     def _math(self, other, operation, reverse=False):
         if other is None:
@@ -58,7 +163,11 @@ class NodeSocket:
         else:
             vector_or_value =  (other, self) if reverse else (self, other)
 
-        if self._socket.type in ['VECTOR','RGBA']:
+        vector_like = self.is_vector_like()
+        folded = self.__class__.fold_math(operation, [self] if other is None else vector_or_value, vector_like)
+        if folded is not None:
+            return folded
+        if vector_like:
             return self.__class__.class_vector_math(operation=operation, vector=vector_or_value)
         else:
             return self.__class__.class_math(operation=operation, value=vector_or_value)
@@ -127,10 +236,18 @@ class NodeSocket:
         return self._math((-1, -1, -1) if self._socket.type == 'VECTOR' else -1, 'MULTIPLY')
 
     def _get_xyz_component(self, component):
+        if self.is_pending_constant() and State.current_node_tree.fold_constants and type(self._constant) is tuple and len(self._constant) == 3:
+            return self.__class__(float(self._constant[component]))
         if self._socket.type != 'VECTOR':
             raise Exception("`x`, `y`, `z` properties are not available on non-Vector types.")
-        separate_node = Node(bpy.types.ShaderNodeSeparateXYZ)._node
-        State.current_node_tree.link(self._socket, separate_node.inputs[0])
+        # Every component of a socket comes from a single Separate XYZ node per tree.
+        separate_nodes = State.current_node_tree.separate_nodes
+        separate_node = separate_nodes.get(socket_identity(self._socket))
+        if separate_node is None:
+            node = Node(bpy.types.ShaderNodeSeparateXYZ,State.current_node_tree.node_key(bpy.types.ShaderNodeSeparateXYZ,self))
+            if not node.is_reused:
+                State.current_node_tree.link(self._socket, node._node.inputs[0])
+            separate_node = separate_nodes[socket_identity(self._socket)] = node._node
         return self.__class__(separate_node.outputs[component])
     @property
     def x(self):
@@ -146,6 +263,8 @@ class NodeSocket:
             return self._get_xyz_component(subscript)
 
 class GeometryNodeSocket(NodeSocket):
+    __slots__ = ()
+
     type_to_node = {
                 float: (bpy.types.ShaderNodeValue, None),
                 int: (bpy.types.FunctionNodeInputInt, 'integer'),
@@ -157,6 +276,18 @@ class GeometryNodeSocket(NodeSocket):
                     }
                 }
 
+    @classmethod
+    @property
+    def class_math(cls):
+        from .dynamic.geometry import math
+        return math
+
+    @classmethod
+    @property
+    def class_vector_math(cls):
+        from .dynamic.geometry import vector_math
+        return vector_math
+
     def _compare(self, other, operation):
         from .dynamic.geometry import compare
         return compare(operation=operation, a=self, b=other)
@@ -186,7 +317,10 @@ class GeometryNodeSocket(NodeSocket):
         return self._compare(other, 'GREATER_EQUAL')
 
     def _boolean_math(self, other, operation, reverse=False):
-        boolean_math_node = Node(bpy.types.FunctionNodeBooleanMath)._node
+        node = Node(bpy.types.FunctionNodeBooleanMath,State.current_node_tree.node_key(bpy.types.FunctionNodeBooleanMath,operation,self,other))
+        boolean_math_node = node._node
+        if node.is_reused:
+            return self.__class__(boolean_math_node.outputs[0])
         boolean_math_node.operation = operation
         a = None
         b = None
@@ -296,12 +430,16 @@ class GeometryNodeSocket(NodeSocket):
                 )
 
 class ShaderNodeSocket(NodeSocket):
+    __slots__ = ()
+
     type_to_node = {
                 float: ( bpy.types.ShaderNodeValue, None),
                 tuple: { 4:(bpy.types.ShaderNodeRGB, None) }
                 }
 
 class CompositorNodeSocket(NodeSocket):
+    __slots__ = ()
+
     type_to_node = {
                 float: (bpy.types.CompositorNodeValue, None),
                 tuple: {}
@@ -313,6 +451,8 @@ class CompositorNodeSocket(NodeSocket):
         return math
 
 class TextureNodeSocket(NodeSocket):
+    __slots__ = ()
+
     @classmethod
     @property
     def class_math(cls):
@@ -1,11 +1,18 @@
 import bpy
+import math
 import inspect
 from . import arrange
+from . import optimize
+from . import interface
 from . import nodesocket
 from .state import State
 from .static.input_group import InputGroup
 from functools import partial
 from .node import NodeOutputs
+from .util import _as_plain_value
+from .reconcile import Reconciler, CommonSubexpressions
+from .graph import Graph, GraphNode
+from .fingerprint import builder_fingerprint, fingerprint_property
 
 
 class InputInfo:
@@ -24,7 +31,30 @@ class ParamInfo:
         self.input_infos = []
         self.builder_input = builder_input
 
+def _default_value_changed(current, value):
+    # IDs are compared as is. Numbers are compared with a tolerance, as sockets store them as 32 bit floats.
+    if isinstance(current, bpy.types.ID) or isinstance(value, bpy.types.ID):
+        return current != value
+    current, value = _as_plain_value(current), _as_plain_value(value)
+    if current is None or value is None:
+        return True
+    current = current if isinstance(current, tuple) else (current,)
+    value = value if isinstance(value, tuple) else (value,)
+    return len(current) != len(value) or any(
+        not math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-6) if isinstance(a, (int, float)) and isinstance(b, (int, float)) else a != b
+        for a, b in zip(current, value)
+    )
+
 class NodeTree:
+    reconcile = False
+    memoize = False
+    deferred = False
+    cse = False
+    fold_constants = False
+    remove_unused = False
+    fuse_math = False
+    layout = 'FULL'
+
     @classmethod
     @property
     def node_trees(cls):
@@ -33,6 +63,13 @@ class NodeTree:
     def __init__(self,node_tree_name=None,**kwargs):
         self.node_tree_name = node_tree_name if node_tree_name else self.__class__.__name__
         self._node_tree = self.get_node_tree()
+        self.reconciler = None
+        self.graph = None
+        self.subexpressions = None
+        self.memoized = False
+        self.literal_sockets = {}
+        self.separate_nodes = {}
+        self.options = kwargs
         for key,value in kwargs.items():
             setattr(self,key,value)
 
@@ -43,39 +80,136 @@ class NodeTree:
         return node_tree
 
     def build_tree(self,builder):
+        fingerprint = self.get_fingerprint(builder) if self.memoize else None
+        if fingerprint is not None and self._node_tree.get(fingerprint_property) == fingerprint:
+            self.memoized = True
+            return self.group_reference
+        self._node_tree.pop(fingerprint_property,None)
+
         self.builder = builder
         self.builder_is_generator = inspect.isgeneratorfunction(builder)
 
         State.NodeSocket = self.get_node_socket_class()
         State.current_node_tree = self
 
-        self.clear_nodes()
+        for option in ('deferred','fuse_math'):
+            if self.reconcile and getattr(self,option):
+                raise Exception(f"The 'reconcile' and '{option}' build options cannot be combined.")
+        if self.layout == 'INCREMENTAL' and not self.reconcile:
+            raise Exception("The 'INCREMENTAL' layout requires the 'reconcile' build option: without it, no node is kept from the previous build.")
+        if self.reconcile:
+            self.reconciler = Reconciler(self._node_tree)
+        else:
+            self.clear_nodes()
+        self.literal_sockets = {}
+        self.separate_nodes = {}
+        if self.cse:
+            self.subexpressions = CommonSubexpressions()
+        # The nodes kept by the reconciler are all still in the tree: they are the ones not to be placed again.
+        previous_nodes = { node.as_pointer() for node in self._node_tree.nodes } if self.layout == 'INCREMENTAL' else set()
         self.param_infos = self.get_param_infos()
         self.set_input_sockets()
+        if self.deferred:
+            self.graph = Graph(self.get_template_tree())
         self.builder_outputs = self.run_builder()
+        if self.graph:
+            self.flush_graph()
         self.set_output_sockets()
+        if self.reconciler:
+            self.reconciler.finish()
+            self.reconciler = None
+        self.subexpressions = None
+        if self.fuse_math:
+            optimize.fuse_math_nodes(self._node_tree)
+        if self.remove_unused:
+            optimize.remove_unused_nodes(self._node_tree)
+
+        self.arrange_nodes(previous_nodes)
+
+        if fingerprint is not None:
+            self._node_tree[fingerprint_property] = fingerprint
+        return self.group_reference
 
-        arrange._arrange(self._node_tree)
+    def arrange_nodes(self,previous_nodes):
+        # Nothing is drawn in background mode, so the layout is skipped altogether.
+        if bpy.app.background or self.layout is None:
+            return
+        if self.layout == 'INCREMENTAL':
+            arrange._arrange_incremental(self._node_tree,{ node.as_pointer() for node in self._node_tree.nodes } - previous_nodes)
+        else:
+            arrange._arrange(self._node_tree)
 
-        return self.group_reference
+    def get_fingerprint(self,builder):
+        return builder_fingerprint(builder,self.__class__.__qualname__,self.node_tree_name,self.options)
 
     def clear_nodes(self):
         self._node_tree.nodes.clear()
 
-    def new_node(self,node_type):
-        return self._node_tree.nodes.new(node_type)
+    def get_template_tree(self):
+        name = f'.{self._node_tree.bl_idname}Templates'
+        template_tree = NodeTree.node_trees.get(name)
+        if template_tree is None:
+            template_tree = NodeTree.node_trees.new(name,self._node_tree.bl_idname)
+        template_tree.nodes.clear()
+        return template_tree
+
+    def flush_graph(self):
+        graph = self.graph
+        self.graph = None
+        graph.flush(self._node_tree)
+        for output in self.builder_outputs.values():
+            output._socket = Graph.resolve(output._socket)
+        NodeTree.node_trees.remove(graph.template_tree)
+
+    def new_node(self,node_type,key=None,deferred=True):
+        if self.graph and deferred:
+            node = self.graph.new_node(node_type)
+        else:
+            node = self._node_tree.nodes.new(node_type)
+            if self.reconciler:
+                self.reconciler.register(node,key,is_new=True)
+        if self.subexpressions:
+            self.subexpressions.add(node,key)
+        return node
+
+    def node_key(self,node_type,*parts):
+        keys = self.reconciler or self.subexpressions
+        return keys.node_key(node_type.__name__,*parts) if keys else None
+
+    def claim_node(self,key):
+        if key is None:
+            return None
+        node = self.subexpressions.get(key) if self.subexpressions else None
+        if node is None and self.reconciler:
+            node = self.reconciler.claim(key)
+            if node is not None and self.subexpressions:
+                self.subexpressions.add(node,key)
+        return node
+
+    def claim_or_new_node(self,node_type,key):
+        return self.claim_node(key) or self.new_node(node_type,key)
+
+    def configure_node(self,node,callback):
+        # Deferred nodes are configured once they are added to the node tree.
+        if isinstance(node, GraphNode):
+            node.callbacks.append(callback)
+        else:
+            callback(node)
 
     def link(self,from_socket,to_socket):
-        self._node_tree.links.new(from_socket,to_socket)
+        if self.graph:
+            self.graph.link(from_socket,to_socket)
+        else:
+            self._node_tree.links.new(from_socket,to_socket)
 
     def get_node_socket_class(self):
         return getattr(nodesocket,f"{self.__class__.node_tree_type}NodeSocket")
 
     def create_group_input_node(self):
-        return self.new_node('NodeGroupInput')
+        return self.claim_or_new_node('NodeGroupInput',Reconciler.make_key('NodeGroupInput'))
 
     def create_group_output_node(self):
-        return self.new_node('NodeGroupOutput')
+        return self.claim_or_new_node('NodeGroupOutput',Reconciler.make_key('NodeGroupOutput'))
 
     @property
     def inputs(self):
@@ -85,9 +219,55 @@ class NodeTree:
     def outputs(self):
         return [i for i in self._node_tree.interface.items_tree if i.item_type == 'SOCKET' and i.in_out == 'OUTPUT']
 
-    def limit_socket_count(self,sockets,count):
-         for socket in sockets[count:]:
-            self._node_tree.interface.remove(socket)
+    can_retype_sockets = True
+
+    def interface_sockets(self,in_out):
+        return self.inputs if in_out == 'INPUT' else self.outputs
+
+    @staticmethod
+    def interface_socket_type(socket):
+        return socket.socket_type
+
+    def new_interface_socket(self,in_out,name,socket_type):
+        return self._node_tree.interface.new_socket(name=name,socket_type=socket_type,in_out=in_out)
+
+    def remove_interface_socket(self,in_out,socket):
+        self._node_tree.interface.remove(socket)
+
+    def move_interface_socket(self,in_out,sockets,from_index,to_index):
+        self._node_tree.interface.move(sockets[from_index],sockets[to_index].position)
+
+    def sync_interface(self,in_out,specs):
+        # Applies the minimal edits making the interface sockets match `specs`, a list of (name, socket_type), and returns the sockets in order.
+        sockets = self.interface_sockets(in_out)
+        matches, removed = interface.plan_interface([ (socket.name, self.interface_socket_type(socket)) for socket in sockets ], specs, self.can_retype_sockets)
+        for j in removed:
+            self.remove_interface_socket(in_out,sockets[j])
+        identifiers = []
+        for (name, socket_type), j in zip(specs, matches):
+            if j is None:
+                socket = self.new_interface_socket(in_out,name,socket_type)
+            else:
+                socket = sockets[j]
+                if socket.name != name:
+                    socket.name = name
+                if self.interface_socket_type(socket) != socket_type:
+                    socket.socket_type = socket_type
+            identifiers.append(socket.identifier)
+
+        sockets = self.interface_sockets(in_out)
+        for from_index, to_index in interface.plan_moves([ socket.identifier for socket in sockets ], identifiers):
+            self.move_interface_socket(in_out,sockets,from_index,to_index)
+            sockets.insert(to_index, sockets.pop(from_index))
+        return sockets
+
+    @staticmethod
+    def base_socket_type(socket_type):
+        from .noderegistrar import NodeRegistrar as nr
+        try:
+            return nr.remove_socket_subtype(socket_type)
+        except KeyError:
+            return socket_type
 
     def get_param_infos(self):
         param_infos = []
@@ -132,30 +312,22 @@ class NodeTree:
 
     def set_input_sockets(self):
         group_input_node = self.create_group_input_node()
-        self._inputs = self.inputs
+        input_infos = [ input_info for param_info in self.param_infos for input_info in param_info.input_infos ]
+        tree_inputs = self.sync_interface('INPUT',[ (input_info.name, input_info.socket_type) for input_info in input_infos ])
+        for input_info, tree_input in zip(input_infos, tree_inputs):
+            if input_info.default_value is not None and _default_value_changed(tree_input.default_value, input_info.default_value):
+                tree_input.default_value = input_info.default_value
+
         for param_info in self.param_infos:
             for input_info in param_info.input_infos:
                 i = input_info.index
-                self.set_tree_input(i,input_info)
                 if param_info.is_input_group:
                     setattr(param_info.builder_input,input_info.group_param,State.NodeSocket.create(group_input_node.outputs[i]) )
                 else:
                     param_info.builder_input = State.NodeSocket.create(group_input_node.outputs[i])
 
-        self.limit_socket_count(self._inputs,self.input_count)
-
-    def set_tree_input(self,i,input_info):
-        if i < len(self._inputs):
-            self._inputs[i].name = input_info.name
-            if self._inputs[i].socket_type != input_info.socket_type:
-                self._inputs[i].socket_type = input_info.socket_type
-                self._inputs = self.inputs
-            tree_input = self._inputs[i]
-        else:
-            tree_input = self._node_tree.interface.new_socket( name=input_info.name,socket_type=input_info.socket_type, in_out='INPUT')
-
-        if input_info.default_value is not None:
-            tree_input.default_value = input_info.default_value
+        if self.reconciler:
+            self.reconciler.register_outputs(group_input_node,Reconciler.make_key('NodeGroupInput'))
 
     def run_builder(self):
         builder_inputs = { param_info.name:param_info.builder_input for param_info in self.param_infos }
@@ -166,29 +338,19 @@ class NodeTree:
     def set_output_sockets(self):
         group_output_node = self.create_group_output_node()
 
-        self._outputs = self.outputs
-        for i, (output_name, output_socket) in enumerate(self.builder_outputs.items()):
-            self.set_tree_output(i,output_name,output_socket)
+        self.sync_interface('OUTPUT',[ (output_name.title(), NodeTree.base_socket_type(output_socket.socket_type)) for output_name, output_socket in self.builder_outputs.items() ])
+        for i, output_socket in enumerate(self.builder_outputs.values()):
             self.link(output_socket._socket, group_output_node.inputs[i])
 
-        self.limit_socket_count(self._outputs,len(self.builder_outputs))
-
-    def set_tree_output(self,i,output_name,output_socket):
-        if i < len(self._outputs):
-            self._outputs[i].name = output_name.title()
-            self._outputs[i].socket_type = output_socket.socket_type
-        else:
-            self._node_tree.interface.new_socket(socket_type=output_socket.socket_type, name=output_name.title(), in_out='OUTPUT')
-
     def group_reference(self,*args,**kwargs):
         return self.nodegroup(node_tree=self._node_tree,*args,**kwargs)
 
 class GeometryNodeTree(NodeTree):
     node_tree_type = 'Geometry'
-    def __init__(self,node_tree_name=None):
+    def __init__(self,node_tree_name=None,**kwargs):
         from .dynamic.geometry import geometrynodegroup
         self.nodegroup = geometrynodegroup
-        super().__init__(node_tree_name)
+        super().__init__(node_tree_name,**kwargs)
 
     def get_node_tree(self):
         node_tree = super().get_node_tree()
@@ -231,35 +393,46 @@ class ShaderNodeTree(NodeTree):
 
     def set_material(self):
         from .dynamic.shader import material_output
+        # A memoized build returns before the tree is made current, and nodes are created in the current tree.
+        State.NodeSocket = self.get_node_socket_class()
+        State.current_node_tree = self
         self._node_tree = self.get_material_node_tree()
         self.clear_nodes()
         group_node = self.nodegroup(node_tree=self.get_node_tree(),return_node=True)._node
         material_output_node = material_output(return_node=True)._node
-        self.link(group_node.outputs[0], material_output_node.inputs['Surface'])
-        arrange._arrange(self._node_tree)
+        # Outputs named after an input of the material output are linked to it, otherwise the first output is the surface.
+        links = [ (group_output, material_output_node.inputs[group_output.name]) for group_output in group_node.outputs if group_output.name in material_output_node.inputs ]
+        for from_socket, to_socket in links or [(group_node.outputs[0], material_output_node.inputs['Surface'])]:
+            self.link(from_socket, to_socket)
+        if not bpy.app.background:
+            arrange._arrange(self._node_tree)
         self._node_tree = self.get_node_tree()
+        self.get_material()[fingerprint_property] = self._node_tree.get(fingerprint_property,'')
 
     def build_tree(self, builder):
         group_reference = super().build_tree(builder)
         if self.material_tree:
-            self.set_material()
+            # A memoized tree only needs its material to be set up again if the material changed since the tree was built.
+            material = ShaderNodeTree.materials.get(self.node_tree_name)
+            if not self.memoized or material is None or material.get(fingerprint_property) != self._node_tree.get(fingerprint_property):
+                self.set_material()
             return self.get_material()
         else:
             return group_reference
 
 class CompositorNodeTree(NodeTree):
     node_tree_type = 'Compositor'
-    def __init__(self,node_tree_name=None):
+    def __init__(self,node_tree_name=None,**kwargs):
         from .dynamic.compositor import compositornodegroup
         self.nodegroup = compositornodegroup
-        super().__init__(node_tree_name)
+        super().__init__(node_tree_name,**kwargs)
 
 class TextureNodeTree(NodeTree):
     node_tree_type = 'Texture'
-    def __init__(self,node_tree_name=None):
+    def __init__(self,node_tree_name=None,**kwargs):
         from .dynamic.texture import texturenodegroup
         self.nodegroup = texturenodegroup
-        super().__init__(node_tree_name)
+        super().__init__(node_tree_name,**kwargs)
 
 def nodetree(builder=None,node_tree_name=None,node_tree_class=None,**kwargs):
     if callable(builder):
@@ -1,4 +1,3 @@
-import bpy
 from .nodetree import NodeTree as FutureNodeTree
 from .nodetree import GeometryNodeTree as FutureGeometryNodeTree
 from .nodetree import ShaderNodeTree as FutureShaderNodeTree
@@ -14,35 +13,23 @@ class NodeTree(FutureNodeTree):
     def outputs(self):
         return self._node_tree.outputs
 
-    def limit_socket_count(self,sockets,count):
-        if type(sockets.rna_type) == bpy.types.NodeTreeInputs:
-            for socket in sockets[count:]:
-                self.inputs.remove(socket)
-        else:
-            for socket in sockets[count:]:
-                self.outputs.remove(socket)
-
-    def set_tree_input(self,i,input_info):
-        if i < len(self._inputs):
-            if self._inputs[i].bl_socket_idname != input_info.socket_type:
-                self.limit_socket_count(self._inputs,i)
-                self._inputs = self.inputs
-                tree_input = self._node_tree.inputs.new(input_info.socket_type, input_info.name)
-            self._inputs[i].name = input_info.name
-            tree_input = self._inputs[i]
-        else:
-            tree_input = self._node_tree.inputs.new(input_info.socket_type, input_info.name)
-        if input_info.default_value is not None:
-            tree_input.default_value = input_info.default_value
-    def set_tree_output(self, i, output_name, output_socket):
-        if i < len(self._outputs):
-            if self._outputs[i].bl_socket_idname != output_socket.socket_type:
-                self.limit_socket_count(self._outputs,i)
-                self._outputs = self.outputs
-                self._node_tree.outputs.new(output_socket.socket_type, output_name)
-            self._outputs[i].name = output_name.title()
-        else:
-            self._node_tree.outputs.new(output_socket.socket_type, output_name.title())
+    can_retype_sockets = False
+
+    def interface_sockets(self,in_out):
+        return list(self.inputs if in_out == 'INPUT' else self.outputs)
+
+    @staticmethod
+    def interface_socket_type(socket):
+        return socket.bl_socket_idname
+
+    def new_interface_socket(self,in_out,name,socket_type):
+        return (self.inputs if in_out == 'INPUT' else self.outputs).new(socket_type,name)
+
+    def remove_interface_socket(self,in_out,socket):
+        (self.inputs if in_out == 'INPUT' else self.outputs).remove(socket)
+
+    def move_interface_socket(self,in_out,sockets,from_index,to_index):
+        (self.inputs if in_out == 'INPUT' else self.outputs).move(from_index,to_index)
 
 FutureGeometryNodeTree.__bases__ = (NodeTree,)
 class GeometryNodeTree(FutureGeometryNodeTree):
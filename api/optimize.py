@@ -0,0 +1,151 @@
+from collections import defaultdict
+from .treeindex import TreeIndex
+
+# Passes run on a node tree once it is built.
+
+def remove_unused_nodes(node_tree):
+    # Nodes without outputs (Group Output, Material Output, Viewer, frames...) are kept with every node they depend on.
+    # The input node of a zone is kept with its output node.
+    index = TreeIndex(node_tree)
+    zone_inputs = defaultdict(list)
+    for node in index.nodes:
+        paired_output = getattr(node, 'paired_output', None)
+        if paired_output is not None:
+            zone_inputs[paired_output.as_pointer()].append(node)
+    used = index.reachable([ node for node in index.nodes if len(node.outputs) == 0 ], extra=zone_inputs)
+    for node in [ node for node in index.nodes if node.as_pointer() not in used ]:
+        node_tree.nodes.remove(node)
+
+class MathFusion:
+    """
+    Peephole pass replacing chains of Math and Vector Math nodes with a single node when Blender has an operation for the whole chain:
+
+    - `a * b + c` becomes MULTIPLY_ADD
+    - `a - floor(a / b) * b` becomes FLOORED_MODULO, when `b` is a non-zero constant (FLOORED_MODULO gives 0 when dividing by zero, the chain gives `a`)
+    - a vector multiplied by a scalar, or by a vector with equal components, becomes SCALE
+
+    Intermediate nodes are only fused when the chain is their only consumer.
+    Every node is rewritten at most once, so the pass runs in a single sweep over the tree.
+    The links read when matching chains are kept up to date as nodes are rewritten and removed.
+    """
+    math_node_types = ('ShaderNodeMath', 'ShaderNodeVectorMath')
+
+    def __init__(self, node_tree):
+        self.node_tree = node_tree
+        index = TreeIndex(node_tree)
+        self.incoming = { pointer: links[0] for pointer, links in index.socket_links.items() }
+        self.consumers = defaultdict(list)
+        for pointer, links in index.outgoing.items():
+            self.consumers[pointer] = [ link.to_node.as_pointer() for link in links ]
+        self.touched = set()
+
+    def run(self):
+        # Pointers are read before any rewrite: removed nodes are skipped without accessing them.
+        for pointer, node in [ (node.as_pointer(), node) for node in self.node_tree.nodes ]:
+            if pointer in self.touched or node.bl_idname not in MathFusion.math_node_types or node.mute:
+                continue
+            match node.operation:
+                case 'ADD':
+                    self.fuse_multiply_add(node)
+                case 'SUBTRACT':
+                    self.fuse_floored_modulo(node)
+                case 'MULTIPLY' if node.bl_idname == 'ShaderNodeVectorMath':
+                    self.fuse_scale(node)
+
+    def source(self, node_input):
+        link = self.incoming.get(node_input.as_pointer())
+        if link is not None:
+            return ('link', link.from_socket)
+        value = node_input.default_value
+        return ('value', tuple(value) if hasattr(value, '__len__') else value)
+
+    @staticmethod
+    def same_source(a, b):
+        if a[0] != b[0]:
+            return False
+        return a[1].as_pointer() == b[1].as_pointer() if a[0] == 'link' else a[1] == b[1]
+
+    def set_source(self, node_input, source):
+        kind, value = source
+        if kind == 'link':
+            link = self.node_tree.links.new(value, node_input)
+            self.incoming[node_input.as_pointer()] = link
+            self.consumers[link.from_node.as_pointer()].append(link.to_node.as_pointer())
+        else:
+            node_input.default_value = value
+
+    def unlink_inputs(self, node):
+        pointer = node.as_pointer()
+        for node_input in node.inputs:
+            link = self.incoming.pop(node_input.as_pointer(), None)
+            if link is not None:
+                from_pointer = link.from_node.as_pointer()
+                self.consumers[from_pointer] = [ consumer for consumer in self.consumers[from_pointer] if consumer != pointer ]
+                self.node_tree.links.remove(link)
+
+    def upstream_node(self, node, index, bl_idname, operation):
+        # Node linked into an input that has no other consumer and can be fused into `node`.
+        link = self.incoming.get(node.inputs[index].as_pointer())
+        if link is None:
+            return None
+        from_node = link.from_node
+        if (from_node.bl_idname != bl_idname or from_node.operation != operation or from_node.mute
+                or getattr(from_node, 'use_clamp', False) or from_node.as_pointer() in self.touched
+                or len(self.consumers[from_node.as_pointer()]) != 1):
+            return None
+        return from_node
+
+    def rewrite(self, node, operation, sources, removed_nodes):
+        for removed_node in removed_nodes:
+            self.unlink_inputs(removed_node)
+        self.unlink_inputs(node)
+        for removed_node in removed_nodes:
+            self.touched.add(removed_node.as_pointer())
+            self.consumers.pop(removed_node.as_pointer(), None)
+            self.node_tree.nodes.remove(removed_node)
+        node.operation = operation
+        for i, source in sources.items():
+            self.set_source(node.inputs[i], source)
+        self.touched.add(node.as_pointer())
+
+    def fuse_multiply_add(self, node):
+        for i in (0, 1):
+            multiply = self.upstream_node(node, i, node.bl_idname, 'MULTIPLY')
+            if multiply is not None:
+                sources = { 0: self.source(multiply.inputs[0]), 1: self.source(multiply.inputs[1]), 2: self.source(node.inputs[1 - i]) }
+                self.rewrite(node, 'MULTIPLY_ADD', sources, [multiply])
+                return
+
+    def fuse_floored_modulo(self, node):
+        if node.bl_idname != 'ShaderNodeMath' or 'FLOORED_MODULO' not in node.bl_rna.properties['operation'].enum_items:
+            return
+        a = self.source(node.inputs[0])
+        multiply = self.upstream_node(node, 1, 'ShaderNodeMath', 'MULTIPLY')
+        if multiply is None:
+            return
+        for i in (0, 1):
+            floor = self.upstream_node(multiply, i, 'ShaderNodeMath', 'FLOOR')
+            divide = self.upstream_node(floor, 0, 'ShaderNodeMath', 'DIVIDE') if floor is not None else None
+            if divide is None:
+                continue
+            b = self.source(multiply.inputs[1 - i])
+            if b[0] != 'value' or b[1] == 0:
+                continue
+            if MathFusion.same_source(a, self.source(divide.inputs[0])) and MathFusion.same_source(b, self.source(divide.inputs[1])):
+                self.rewrite(node, 'FLOORED_MODULO', { 0: a, 1: b }, [multiply, floor, divide])
+                return
+
+    def fuse_scale(self, node):
+        for i in (0, 1):
+            kind, value = scalar = self.source(node.inputs[i])
+            if kind == 'link' and value.type in ('VALUE', 'INT'):
+                scale = scalar
+            elif kind == 'value' and len(set(value)) == 1:
+                scale = ('value', value[0])
+            else:
+                continue
+            self.rewrite(node, 'SCALE', { 0: self.source(node.inputs[1 - i]), 3: scale }, [])
+            return
+
+def fuse_math_nodes(node_tree):
+    MathFusion(node_tree).run()
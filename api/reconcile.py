@@ -0,0 +1,108 @@
+import bpy
+import enum
+import hashlib
+from collections import defaultdict
+from .nodesocket import NodeSocket
+from .static.curve import Curve
+from .graph import GraphSocket, socket_identity
+from .treeindex import TreeIndex
+
+class StructuralKeys:
+    """
+    Keys identifying a node by its type, properties, literal inputs and the keys of the sockets linked into it.
+    Subclasses define `socket_key`, the key of a linked socket.
+    """
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def value_key(self, value):
+        value = NodeSocket.unwrap_constant(value)
+        if isinstance(value, NodeSocket):
+            value = value._socket
+        if isinstance(value, (bpy.types.NodeSocket, GraphSocket)):
+            return self.socket_key(value)
+        elif isinstance(value, enum.Enum):
+            return repr(value.value)
+        elif isinstance(value, Curve):
+            return tuple( (point.x, point.y, point.handle_type.value) for point in value.points )
+        elif isinstance(value, (list, tuple)):
+            keys = tuple( self.value_key(item) for item in value )
+            return None if None in keys else keys
+        else:
+            return repr(value)
+
+    def node_key(self, node_type_name, *parts):
+        keys = []
+        for part in parts:
+            key = self.value_key(part)
+            if key is None:
+                return None
+            keys.append(key)
+        return StructuralKeys.make_key(node_type_name, *keys)
+
+class CommonSubexpressions(StructuralKeys):
+    """
+    The nodes added during a single build, by structural key.
+
+    A node requested with the key of a node added earlier in the same build is the same computation, so that node is used instead of adding a duplicate.
+    """
+    def __init__(self):
+        self.nodes = {}
+
+    def socket_key(self, socket):
+        return socket_identity(socket)
+
+    def get(self, key):
+        return self.nodes.get(key)
+
+    def add(self, node, key):
+        if key is not None:
+            self.nodes.setdefault(key, node)
+
+class Reconciler(StructuralKeys):
+    """
+    Matches the nodes requested while a tree is rebuilt against the nodes of the previous build.
+
+    Every generated node stores a structural key made of its type, properties, literal inputs and the keys of the nodes linked into it.
+    A node requested with the key of an existing node reuses that node as is, so only the nodes that changed are added or removed.
+    """
+    key_property = 'nodetree_script_key'
+
+    def __init__(self, node_tree):
+        self.node_tree = node_tree
+        self.unclaimed = defaultdict(list)
+        for node in node_tree.nodes:
+            self.unclaimed[node.get(Reconciler.key_property)].append(node)
+        self.kept = []
+        self.socket_keys = {}
+
+    def socket_key(self, socket):
+        return self.socket_keys.get(socket.as_pointer())
+
+    def claim(self, key):
+        nodes = self.unclaimed.get(key)
+        if not nodes:
+            return None
+        node = nodes.pop()
+        self.register(node, key)
+        return node
+
+    def register(self, node, key, is_new=False):
+        self.kept.append(node)
+        if key is None:
+            return
+        if is_new:
+            node[Reconciler.key_property] = key
+        self.register_outputs(node, key)
+
+    def register_outputs(self, node, key):
+        for i, node_output in enumerate(node.outputs):
+            self.socket_keys[node_output.as_pointer()] = (key, i)
+
+    def finish(self):
+        # Old nodes still linked into a kept node are structurally identical to a claimed one and are kept as well.
+        # Every node of the tree is either kept or unclaimed, so the nodes reached from the kept ones are kept.
+        kept = TreeIndex(self.node_tree).reachable(self.kept)
+        for node in [ node for nodes in self.unclaimed.values() for node in nodes if node.as_pointer() not in kept ]:
+            self.node_tree.nodes.remove(node)
@@ -0,0 +1,33 @@
+import enum
+import json
+from collections import defaultdict
+from .nodeinfo import NodeInfo
+
+# Serialized registrar contents, readable without `bpy`.
+# Used to generate the typeshed and documentation outside of Blender.
+
+def write_snapshot(path, snapshot):
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, default=lambda x: sorted(x) if isinstance(x, set) else repr(x))
+
+def read_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+class SnapshotRegistrar:
+    """
+    Stand-in for a `NodeRegistrar` restored from a snapshot, providing what `Docs` reads.
+    """
+    def __init__(self, data):
+        self.node_tree_type = data['node_tree_type']
+        self.node_infos = [ NodeInfo.from_dict(node_info_data) for node_info_data in data['node_infos'] ]
+        self.enums = defaultdict(list)
+        for node_info in self.node_infos:
+            for enum_name, enum_cases in node_info.enums.items():
+                self.enums[node_info.namespace].append(enum.Enum(enum_name, enum_cases))
+        self.math_funcs = data['math_funcs']
+        self.enum_socket_type = data['enum_socket_type']
+        self.data = data
+
+    def to_dict(self):
+        return self.data
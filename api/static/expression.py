@@ -1,6 +1,13 @@
 from ..state import State
 def scripted_expression(scripted_expression: str) -> 'NodeSocket':
-    value_node = State.current_node_tree.new_node(State.NodeSocket.type_to_node[float][0].__name__)
-    fcurve = value_node.outputs[0].driver_add("default_value")
+    node_type = State.NodeSocket.type_to_node[float][0]
+    key = State.current_node_tree.node_key(node_type, 'driver', scripted_expression)
+    value_node = State.current_node_tree.claim_node(key)
+    if value_node is None:
+        value_node = State.current_node_tree.new_node(node_type.__name__, key)
+        State.current_node_tree.configure_node(value_node, lambda node: _add_driver(node, scripted_expression))
+    return State.NodeSocket.create(value_node.outputs[0])
+
+def _add_driver(node, scripted_expression):
+    fcurve = node.outputs[0].driver_add("default_value")
     fcurve.driver.expression = scripted_expression
-    return State.NodeSocket.create(value_node.outputs[0])
\ No newline at end of file
@@ -19,8 +19,9 @@ def socket_type_to_data_type(socket_type):
 
 def zone(block: typing.Callable,zone_input_node_type,zone_output_node_type,zone_out_items_attribute):
     def wrapped(*args, **kwargs):
-        zone_in = State.current_node_tree.new_node(zone_input_node_type.__name__)
-        zone_out = State.current_node_tree.new_node(zone_output_node_type.__name__)
+        # Zone nodes are paired and edited right away, so they are never deferred.
+        zone_in = State.current_node_tree.new_node(zone_input_node_type.__name__,deferred=False)
+        zone_out = State.current_node_tree.new_node(zone_output_node_type.__name__,deferred=False)
         zone_in.pair_with_output(zone_out)
         zone_out_items = getattr(zone_out,zone_out_items_attribute)
         for item in zone_out_items:
@@ -0,0 +1,96 @@
+import numpy as np
+from collections import defaultdict
+from .util import level_topo_sort, topo_sort
+
+def selected_nodes(node_tree):
+    # Selection read with a single bulk read instead of one RNA access per node.
+    nodes = node_tree.nodes
+    select = np.zeros(len(nodes), dtype=bool)
+    nodes.foreach_get('select', select)
+    return [ nodes[int(i)] for i in np.flatnonzero(select) ]
+
+class TreeIndex:
+    """
+    Links of a node tree indexed by node and by socket, read once and shared by the passes that walk the tree
+    (layout, export to script, reconcile, dead node removal, math fusion...).
+
+    When `nodes` is given, only these nodes and the links between them are indexed.
+    Blender has no bulk access to the ends of links, so links are still visited once, but only their target node is read
+    unless it is one of the given nodes, and no link is visited at all when none of the given nodes has a linked input.
+    """
+    def __init__(self, node_tree, nodes=None):
+        self.node_tree = node_tree
+        self.nodes = list(node_tree.nodes if nodes is None else nodes)
+        self.pointers = { node.as_pointer() for node in self.nodes }
+        self.links = []
+        self.incoming = defaultdict(list)
+        self.outgoing = defaultdict(list)
+        self.socket_links = defaultdict(list)
+        if nodes is None:
+            links = node_tree.links
+        elif any( node_input.is_linked for node in self.nodes for node_input in node.inputs ):
+            links = ( link for link in node_tree.links if link.to_node.as_pointer() in self.pointers )
+        else:
+            links = ()
+        for link in links:
+            from_pointer = link.from_node.as_pointer()
+            if nodes is not None and from_pointer not in self.pointers:
+                continue
+            self.links.append(link)
+            self.incoming[link.to_node.as_pointer()].append(link)
+            self.outgoing[from_pointer].append(link)
+            self.socket_links[link.to_socket.as_pointer()].append(link)
+        self._graph = None
+        self._levels = None
+
+    @property
+    def linked_sockets(self):
+        return self.socket_links.keys()
+
+    # Linked nodes are listed once, even when several links join the same two nodes.
+    def upstream(self, node):
+        return list({ link.from_node.as_pointer(): link.from_node for link in self.incoming[node.as_pointer()] }.values())
+
+    def downstream(self, node):
+        return list({ link.to_node.as_pointer(): link.to_node for link in self.outgoing[node.as_pointer()] }.values())
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = { node: self.downstream(node) for node in self.nodes }
+        return self._graph
+
+    def topological_order(self):
+        return topo_sort(self.graph)
+
+    def levels(self):
+        # Columns of nodes by longest path to a sink, from the sources to the sinks.
+        # Nodes on a cycle, and the nodes linked after them, are left out of the topological sort: the other nodes are placed without them,
+        # and they are added as a last column.
+        if self._levels is None:
+            graph = self.graph
+            order = topo_sort(graph)
+            if len(order) < len(graph):
+                ordered = set(order)
+                graph = { node: [ n for n in graph[node] if n in ordered ] for node in order }
+            self._levels = [ list(level) for level in level_topo_sort(graph) ]
+            if len(order) < len(self.graph):
+                self._levels.append([ node for node in self.nodes if node not in ordered ])
+        return self._levels
+
+    def reachable(self, nodes, upstream=True, extra=None):
+        # Pointers of the given nodes and of every node they depend on (or that depends on them when `upstream` is False).
+        # `extra` maps node pointers to nodes followed as well, for dependencies that are not links.
+        edges = self.incoming if upstream else self.outgoing
+        extra = extra or {}
+        stack = [ node.as_pointer() for node in nodes ]
+        reached = set(stack)
+        while stack:
+            pointer = stack.pop()
+            next_nodes = [ link.from_node if upstream else link.to_node for link in edges[pointer] ] + extra.get(pointer, [])
+            for next_node in next_nodes:
+                next_pointer = next_node.as_pointer()
+                if next_pointer not in reached:
+                    reached.add(next_pointer)
+                    stack.append(next_pointer)
+        return reached
@@ -1,5 +1,5 @@
-import bpy
 import re
+import functools
 from collections import deque
 
 lower_snake_case = lambda x: re.sub(r'[ -./]', '_', x.lower())
@@ -12,19 +12,65 @@ def _as_iterable(x):
     except:
         return [x]
 
+def _as_plain_value(x):
+    if x is None or isinstance(x,(bool,int,float,str,set)):
+        return x
+    try:
+        return tuple(x)
+    except:
+        return None
+
+class BpyTypeIndex:
+    # `bpy.types` hierarchy as base type -> subclasses, rebuilt only when the set of registered types changes.
+    type_names = None
+    subclasses = {}
+
+    @classmethod
+    def get_subclasses(cls,base_bpy_type):
+        import bpy
+        type_names = dir(bpy.types)
+        if type_names != cls.type_names:
+            cls.build(type_names)
+        return cls.subclasses.get(base_bpy_type,())
+
+    @classmethod
+    def build(cls,type_names):
+        import bpy
+        subclasses = {}
+        for bpy_type_name in type_names:
+            bpy_type = getattr(bpy.types, bpy_type_name)
+            if isinstance(bpy_type,type):
+                for base in bpy_type.__mro__:
+                    subclasses.setdefault(base,[]).append(bpy_type)
+        cls.subclasses = subclasses
+        cls.type_names = type_names
+
 def get_bpy_subclasses(base_bpy_type,include_base=False):
-    for bpy_type_name in dir(bpy.types):
-        bpy_type = getattr(bpy.types, bpy_type_name)
-        if isinstance(bpy_type,type) and issubclass(bpy_type,base_bpy_type) and (include_base or bpy_type != base_bpy_type):
+    for bpy_type in BpyTypeIndex.get_subclasses(base_bpy_type):
+        if include_base or bpy_type != base_bpy_type:
             yield bpy_type
 
+@functools.cache
 def get_unique_subclass_properties(bpy_type):
-    parent_props = [prop for base in bpy_type.__bases__ for prop in base.bl_rna.properties]
-    for prop in bpy_type.bl_rna.properties:
-        if not prop in parent_props:
-            yield prop
+    parent_props = { prop.identifier for base in bpy_type.__bases__ for prop in base.bl_rna.properties }
+    return tuple( prop for prop in bpy_type.bl_rna.properties if prop.identifier not in parent_props )
+
+class PropertyInfo:
+    def __init__(self, prop):
+        self.prop = prop
+        self.identifier = prop.identifier
+        self.argname = lower_snake_case(prop.identifier)
+        self.type = prop.type
+        self.typename = prop.type.title()
+        self.enum_name = title_case(prop.identifier) if prop.type == 'ENUM' else None
+        self.enum_items = tuple( enum_item.identifier for enum_item in prop.enum_items ) if prop.type == 'ENUM' else ()
+
+@functools.cache
+def get_property_infos(bpy_type):
+    return tuple( PropertyInfo(prop) for prop in get_unique_subclass_properties(bpy_type) )
 
 def non_virtual_sockets(sockets):
+    import bpy
     return [ socket for socket in sockets if type(socket) != bpy.types.NodeSocketVirtual ]
 
 def enabled_sockets(sockets):
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import importlib
+import bpy
+from ..operators.batch_export import export_node_trees
+from .roundtrip import synthetic_tree, new_interface_socket, tree_signature, remove_tree
+
+# Import and build check of a package written by the batch export:
+# two identical node groups and a tree using both are exported, the package is imported, which rebuilds the trees in place,
+# and the rebuilt trees must match the original ones.
+#
+#   blender --background --python-expr "from <addon>.benchmarks.export_package import main; main()"
+
+GROUP_NAMES = ('Export Check Group', 'Export Check Copy')
+OUTER_NAME = 'Export Check Tree'
+
+def outer_tree(groups):
+    node_tree = bpy.data.node_groups.new(OUTER_NAME, 'GeometryNodeTree')
+    new_interface_socket(node_tree, 'INPUT', 'Value')
+    new_interface_socket(node_tree, 'OUTPUT', 'Result')
+    group_input = node_tree.nodes.new('NodeGroupInput')
+    group_output = node_tree.nodes.new('NodeGroupOutput')
+    socket = group_input.outputs[0]
+    for group in groups:
+        group_node = node_tree.nodes.new('GeometryNodeGroup')
+        group_node.node_tree = group
+        node_tree.links.new(socket, group_node.inputs[0])
+        socket = group_node.outputs[0]
+    node_tree.links.new(socket, group_output.inputs[0])
+    return node_tree
+
+def check(size=50):
+    """
+    Failures of the export, import and rebuild of a package with two identical groups and a tree using both.
+    """
+    for name in (OUTER_NAME,) + GROUP_NAMES:
+        remove_tree(name)
+    groups = [ synthetic_tree(name, 'GeometryNodeTree', size) for name in GROUP_NAMES ]
+    outer = outer_tree(groups)
+    signatures = { node_tree.name: tree_signature(node_tree) for node_tree in [outer] + groups }
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        package = 'nodetree_script_export_check'
+        result = export_node_trees(os.path.join(directory, package), processes=1)
+        failures += [ f"Could not export {name}: {error}" for name, error in result.failures ]
+        modules = [ module for module in result.modules if module.startswith('export_check') ]
+        if len(modules) != 2:
+            failures.append(f"Expected the identical groups to be exported once, got the modules {modules}")
+        sys.path.insert(0, directory)
+        try:
+            importlib.import_module(package)
+        except Exception as e:
+            failures.append(f"Could not import the exported package: {e!r}")
+        finally:
+            sys.path.remove(directory)
+            for module in [ module for module in sys.modules if module.split('.')[0] == package ]:
+                del sys.modules[module]
+    for name, signature in signatures.items():
+        node_tree = bpy.data.node_groups.get(name)
+        if node_tree is None or tree_signature(node_tree) != signature:
+            failures.append(f"{name} is different once rebuilt")
+    for name in (OUTER_NAME,) + GROUP_NAMES:
+        remove_tree(name)
+    return failures
+
+def main():
+    failures = check()
+    for failure in failures:
+        print(failure)
+    print('Export check failed' if failures else 'Export check passed')
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,78 @@
+import sys
+import bpy
+from ..api.nodetree import materialtree, geometrytree
+from ..api.fingerprint import fingerprint_property
+from ..api.dynamic.shader import principled_bsdf
+from ..api.dynamic.geometry import cube
+from .roundtrip import remove_tree
+
+# Check of memoized material trees: when the tree is unchanged but its material is missing or stale,
+# the material is set up again in the material's own node tree, even after another tree was built.
+#
+#   blender --background --python-expr "from <addon>.benchmarks.memoize import main; main()"
+
+MATERIAL_NAME = 'Memoize Check Material'
+OTHER_NAME = 'Memoize Check Other'
+
+def build_material():
+    @materialtree(MATERIAL_NAME, memoize=True)
+    def memoize_check_material():
+        return principled_bsdf()
+    return memoize_check_material
+
+def build_other():
+    @geometrytree(OTHER_NAME)
+    def memoize_check_other():
+        return cube()
+    return bpy.data.node_groups[OTHER_NAME]
+
+def material_failures(material, case):
+    if material is None or material.node_tree is None:
+        return [f"{case}: the material was not created"]
+    output = next(( node for node in material.node_tree.nodes if node.bl_idname == 'ShaderNodeOutputMaterial' ), None)
+    if output is None or not output.inputs['Surface'].is_linked:
+        return [f"{case}: the material output is not linked"]
+    return []
+
+def remove_material():
+    material = bpy.data.materials.get(MATERIAL_NAME)
+    if material is not None:
+        bpy.data.materials.remove(material)
+
+def check():
+    """
+    Failures of the rebuild of a memoized material tree whose material is missing or stale.
+    """
+    remove_material()
+    for name in (MATERIAL_NAME, OTHER_NAME):
+        remove_tree(name)
+    failures = []
+    try:
+        failures += material_failures(build_material(), "First build")
+
+        remove_material()
+        other = build_other()
+        other_nodes = len(other.nodes)
+        failures += material_failures(build_material(), "Missing material")
+        if len(other.nodes) != other_nodes:
+            failures.append("Missing material: nodes were added to the tree built last")
+
+        material = bpy.data.materials[MATERIAL_NAME]
+        material.node_tree.nodes.clear()
+        material[fingerprint_property] = 'stale'
+        failures += material_failures(build_material(), "Stale material")
+    except Exception as e:
+        failures.append(f"Could not build the material: {e!r}")
+    finally:
+        remove_material()
+        for name in (MATERIAL_NAME, OTHER_NAME):
+            remove_tree(name)
+    return failures
+
+def main():
+    failures = check()
+    for failure in failures:
+        print(failure)
+    print('Memoize check failed' if failures else 'Memoize check passed')
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,195 @@
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import importlib
+import bpy
+from ..api.treeindex import TreeIndex
+from ..operators.nodetree_to_script import snapshot_nodes, format_script
+from ..operators.batch_export import tree_decorators, dynamic_module
+
+# Round trip benchmark of the conversion between node trees and scripts:
+# a synthetic tree is exported to a script, the script is run to build a new tree, and the new tree is exported again.
+# Both trees must have the same nodes, links and input values, and both exports must give the same script.
+# Every timing is the fastest of several runs.
+#
+#   blender --background --python-expr "from <addon>.benchmarks.roundtrip import main; main()" -- --output results.json --baseline baseline.json
+
+SIZES = (100, 1000, 10000)
+REPEAT = 5
+TREE_TYPES = ('GeometryNodeTree', 'ShaderNodeTree', 'CompositorNodeTree', 'TextureNodeTree')
+math_node_types = {
+    'GeometryNodeTree': 'ShaderNodeMath',
+    'ShaderNodeTree': 'ShaderNodeMath',
+    'CompositorNodeTree': 'CompositorNodeMath',
+    'TextureNodeTree': 'TextureNodeMath',
+}
+operations = ('ADD', 'SUBTRACT', 'MULTIPLY', 'MAXIMUM', 'MINIMUM')
+addon_module = __name__.split('.')[0]
+
+def new_interface_socket(node_tree, in_out, name):
+    if hasattr(node_tree, 'interface'):
+        return node_tree.interface.new_socket(name=name, in_out=in_out, socket_type='NodeSocketFloat')
+    return (node_tree.inputs if in_out == 'INPUT' else node_tree.outputs).new('NodeSocketFloat', name)
+
+def synthetic_tree(name, tree_type, size, seed=0):
+    """
+    A node tree with `size` Math nodes, each using the tree input or earlier nodes, either linked or as constants.
+    """
+    rng = random.Random(seed)
+    node_tree = bpy.data.node_groups.new(name, tree_type)
+    new_interface_socket(node_tree, 'INPUT', 'Value')
+    new_interface_socket(node_tree, 'OUTPUT', 'Result')
+    group_input = node_tree.nodes.new('NodeGroupInput')
+    group_output = node_tree.nodes.new('NodeGroupOutput')
+    sources = [group_input.outputs[0]]
+    for _ in range(size):
+        node = node_tree.nodes.new(math_node_types[tree_type])
+        node.operation = rng.choice(operations)
+        node_tree.links.new(rng.choice(sources[-64:]), node.inputs[0])
+        if rng.random() < 0.5:
+            node_tree.links.new(rng.choice(sources), node.inputs[1])
+        else:
+            node.inputs[1].default_value = round(rng.uniform(-10, 10), 3)
+        sources.append(node.outputs[0])
+    node_tree.links.new(sources[-1], group_output.inputs[0])
+    return node_tree
+
+def export_tree(node_tree, function_name, tree_name):
+    snapshot = snapshot_nodes(list(node_tree.nodes), make_function=True)
+    return format_script(snapshot, make_function=True, function_name=function_name, decorator=f"{tree_decorators[node_tree.type]}({tree_name!r}, memoize=False)")
+
+def input_value(node_input):
+    value = getattr(node_input, 'default_value', None)
+    if isinstance(value, (int, float)):
+        return round(value, 5)
+    if hasattr(value, '__len__') and not isinstance(value, str):
+        return tuple( round(x, 5) for x in value )
+    return value
+
+def tree_signature(node_tree):
+    """
+    Canonical description of a tree, independent of node order and names: the sorted hashes of its nodes.
+    A node is hashed, in topological order, from its type, its operation and every enabled input,
+    described by the hash and socket of the nodes linked into it or by its value when unlinked.
+    """
+    index = TreeIndex(node_tree)
+    hashes = {}
+    for node in index.topological_order():
+        inputs = []
+        for node_input in node.inputs:
+            if not node_input.enabled:
+                continue
+            links = index.socket_links.get(node_input.as_pointer())
+            if links:
+                inputs.append(('link', tuple( (hashes[link.from_node.as_pointer()], link.from_socket.identifier) for link in links )))
+            else:
+                inputs.append(('value', input_value(node_input)))
+        description = (node.bl_idname, getattr(node, 'operation', None), tuple(inputs))
+        hashes[node.as_pointer()] = hashlib.sha1(repr(description).encode()).hexdigest()
+    return sorted(hashes.values())
+
+def fastest(function, repeat):
+    # Result of the last call and fastest time of `repeat` calls.
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+def script_namespace(tree_type):
+    # Names available to an exported script: the add-on API and the node functions of the tree type.
+    namespace = dict(vars(importlib.import_module(addon_module)))
+    exec(f"from {dynamic_module(tree_type)} import *", namespace)
+    return namespace
+
+def remove_tree(name):
+    node_tree = bpy.data.node_groups.get(name)
+    if node_tree is not None:
+        bpy.data.node_groups.remove(node_tree)
+
+def run_case(tree_type, size, seed=0, repeat=REPEAT):
+    name = f"Benchmark {tree_type} {size}"
+    rebuilt_name = f"{name} Roundtrip"
+    function_name = f"benchmark_{size}"
+    for tree_name in (name, rebuilt_name):
+        remove_tree(tree_name)
+    node_tree = synthetic_tree(name, tree_type, size, seed)
+    try:
+        script, export_time = fastest(lambda: export_tree(node_tree, function_name, rebuilt_name), repeat)
+        namespace = script_namespace(node_tree.type)
+        _, build_time = fastest(lambda: exec(script, dict(namespace)), repeat)
+        rebuilt = bpy.data.node_groups[rebuilt_name]
+        rebuilt_script, reexport_time = fastest(lambda: export_tree(rebuilt, function_name, rebuilt_name), repeat)
+
+        return {
+            'tree_type': tree_type,
+            'size': size,
+            'export': export_time,
+            'build': build_time,
+            'reexport': reexport_time,
+            'structurally_equal': tree_signature(node_tree) == tree_signature(rebuilt),
+            'script_equal': script == rebuilt_script,
+        }
+    finally:
+        for tree_name in (name, rebuilt_name):
+            remove_tree(tree_name)
+
+def run(tree_types=TREE_TYPES, sizes=SIZES, seed=0, repeat=REPEAT):
+    return {
+        'blender_version': list(bpy.app.version),
+        'repeat': repeat,
+        'results': [ run_case(tree_type, size, seed, repeat) for tree_type in tree_types for size in sizes ],
+    }
+
+def compare(current, baseline, tolerance=1.25):
+    """
+    Regressions of `current` against `baseline` (both as returned by `run`): timings more than `tolerance` times slower
+    than in the baseline, and round trips that are no longer faithful.
+    """
+    baseline_results = { (result['tree_type'], result['size']): result for result in baseline['results'] }
+    regressions = []
+    for result in current['results']:
+        key = (result['tree_type'], result['size'])
+        for check in ('structurally_equal', 'script_equal'):
+            if not result[check]:
+                regressions.append(f"{key[0]} {key[1]}: {check} failed")
+        previous = baseline_results.get(key)
+        if previous is None:
+            continue
+        for timing in ('export', 'build', 'reexport'):
+            if result[timing] > previous[timing] * tolerance:
+                regressions.append(f"{key[0]} {key[1]}: {timing} took {result[timing]:.3f}s, {result[timing] / previous[timing]:.2f}x the baseline")
+    return regressions
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="Time and check the round trip of node trees through scripts.")
+    parser.add_argument('--output', help="JSON file the results are written to")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="Slowdown relative to the baseline reported as a regression")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--tree-types', nargs='+', default=TREE_TYPES, choices=TREE_TYPES)
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Runs of every step, the fastest one is kept")
+    args = parser.parse_args(argv)
+
+    current = run(args.tree_types, args.sizes, repeat=args.repeat)
+    for result in current['results']:
+        print(f"{result['tree_type']:<20} {result['size']:>6}  export {result['export']:.3f}s  build {result['build']:.3f}s  re-export {result['reexport']:.3f}s  "
+              f"{'ok' if result['structurally_equal'] and result['script_equal'] else 'MISMATCH'}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(current, baseline or {'results': []}, args.tolerance)
+    for regression in regressions:
+        print(regression)
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,50 @@
+"""
+Generate the typeshed and HTML documentation from a registry snapshot, without Blender.
+
+Write a snapshot from a Blender session with the add-on enabled:
+```
+blender --background --python-expr "import nodetree_script; nodetree_script.write_registry_snapshot('registry.json')"
+```
+
+Then generate the files from it:
+```
+python generate_docs.py registry.json --output build/4.1
+```
+"""
+import argparse
+import importlib
+import os
+import sys
+import types
+
+def import_addon_module(name):
+    # Import a module of the add-on without running its `__init__.py`, which requires `bpy`.
+    package_name = 'nodetree_script'
+    if package_name not in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [os.path.dirname(os.path.realpath(__file__))]
+        sys.modules[package_name] = package
+    return importlib.import_module(f'{package_name}.{name}')
+
+def generate_docs(snapshot_path, output_path=None):
+    docs = import_addon_module('api.docs')
+    snapshot = import_addon_module('api.snapshot')
+    data = snapshot.read_snapshot(snapshot_path)
+    for node_tree_type, registrar_data in data['registrars'].items():
+        docs.Docs(
+            snapshot.SnapshotRegistrar(registrar_data),
+            node_tree_type,
+            blender_version=data['blender_version'],
+            socket_class_names=data['socket_class_names'],
+            output_path=output_path
+        ).create_documentation()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the NodeTree Script typeshed and documentation from a registry snapshot.")
+    parser.add_argument('snapshot', help="Path to a snapshot written by `write_registry_snapshot`")
+    parser.add_argument('--output', default=None, help="Directory to write `typeshed/`, `docs/` and their `cache/` into (defaults to the add-on directory)")
+    args = parser.parse_args(argv)
+    generate_docs(args.snapshot, os.path.abspath(args.output) if args.output else None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import os
+import re
+import sys
+import hashlib
+import argparse
+import multiprocessing
+import bpy
+from concurrent.futures import ProcessPoolExecutor
+from ..api.util import topo_sort, lower_snake_case, Attrs
+from .nodetree_to_script import snapshot_nodes, format_script, node_groups
+
+# Export of every node group and material of a file to a package with one module per tree.
+# Trees are read into snapshots in dependency order, trees identical to an already exported tree are replaced with an alias,
+# and the snapshots are formatted to scripts, in worker processes when running in background mode.
+
+tree_decorators = {'GEOMETRY': 'geometrytree', 'SHADER': 'shadertree', 'COMPOSITING': 'compositortree', 'TEXTURE': 'texturetree'}
+# `api.dynamic` modules with the node functions of every tree type.
+dynamic_modules = {'GEOMETRY': 'geometry', 'SHADER': 'shader', 'COMPOSITING': 'compositor', 'TEXTURE': 'texture'}
+addon_module = __name__.split('.')[0]
+
+def export_sources():
+    sources = [ Attrs(name=node_tree.name, material=None, node_tree=node_tree) for node_tree in bpy.data.node_groups ]
+    sources += [ Attrs(name=material.name, material=material, node_tree=material.node_tree) for material in bpy.data.materials if material.use_nodes and material.node_tree is not None ]
+    return [ source for source in sources if source.node_tree.type in tree_decorators and len(source.node_tree.nodes) > 0 ]
+
+def tree_dependencies(node_tree):
+    return { node.node_tree.name for node in node_tree.nodes if type(node) in node_groups and node.node_tree is not None }
+
+def dependency_order(sources):
+    # Node groups before the trees using them.
+    groups = { source.name: source for source in sources if source.material is None }
+    graph = { id(source): [] for source in sources }
+    for source in sources:
+        for name in tree_dependencies(source.node_tree) & groups.keys():
+            graph[id(groups[name])].append(id(source))
+    by_id = { id(source): source for source in sources }
+    return [ by_id[source_id] for source_id in topo_sort(graph) ]
+
+def make_identifier(name, suffix, used):
+    identifier = re.sub(r'\W', '_', lower_snake_case(name)) + suffix
+    if identifier[0].isdigit():
+        identifier = '_' + identifier
+    unique, i = identifier, 1
+    while unique in used:
+        i += 1
+        unique = f'{identifier}_{i}'
+    used.add(unique)
+    return unique
+
+def dynamic_module(tree_type):
+    return f"{addon_module}.api.dynamic.{dynamic_modules[tree_type]}"
+
+def plain_key(value):
+    if isinstance(value, Attrs):
+        return ('Attrs', plain_key(sorted(vars(value).items())))
+    if isinstance(value, (list, tuple)):
+        return tuple(map(plain_key, value))
+    if isinstance(value, set):
+        return ('set', tuple(sorted(map(repr, value))))
+    return value
+
+def content_key(snapshot):
+    # Content of a snapshot independent of the order of the nodes and of their symbols: every node is described by its
+    # function, the arguments that are not links, and the descriptions of the nodes linked into it.
+    # Nodes are in topological order, so the nodes linked into a node are described before it.
+    labels = {}
+    for info in snapshot.nodes:
+        linked = { (argname, input_index) for argname, input_index, _, _ in info.links }
+        args = tuple( (argname, plain_key([ value for i, value in enumerate(values) if (argname, i) not in linked ])) for argname, values in info.args.items() )
+        links = tuple(sorted( (argname, input_index, labels[from_symbol], from_socket) for argname, input_index, from_symbol, from_socket in info.links ))
+        description = (info.func_name, info.alt_func_name, info.func_call, info.is_group_input, info.is_group_output, info.group_tree, args, links)
+        labels[info.symbol] = hashlib.sha1(repr(description).encode()).hexdigest()
+    outputs = tuple(sorted( (to_socket, labels[from_symbol], from_socket) for from_symbol, from_socket, to_socket in snapshot.output_links ))
+    inputs = plain_key([ (argname, sorted(vars(value).items())) for argname, value in snapshot.inputs.items() ])
+    return (snapshot.type, tuple(sorted(labels.values())), inputs, outputs)
+
+def format_job(job):
+    snapshot, function_name, decorator = job
+    return format_script(snapshot, make_function=True, function_name=function_name, decorator=decorator)
+
+def format_snapshots(jobs, processes=None):
+    # Formatting only reads the snapshots, so it can run in forked processes, which inherit the add-on modules without importing bpy.
+    # Forking is only safe when Blender runs in background mode: the UI has other threads and a GPU context.
+    # Elsewhere, and on platforms without fork, the snapshots are formatted in the current process.
+    if not bpy.app.background or processes == 1 or len(jobs) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [ format_job(job) for job in jobs ]
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(format_job, jobs, chunksize=max(1, len(jobs) // (4 * processes))))
+
+def export_node_trees(directory, processes=None):
+    """
+    Write every node group and material of the current file to `directory` as a package with one module per tree.
+
+    Node groups used by other trees are exported first and called by name from the modules using them.
+    Node groups identical to an already exported group, apart from their name, are exported as an alias of that group.
+    Returns the exported modules and the trees that could not be exported with the error raised.
+    """
+    used = set()
+    function_names = {}
+    modules = {}
+    aliases = {}
+    seen = {}
+    jobs = []
+    failures = []
+    for source in dependency_order(export_sources()):
+        try:
+            output_node_types = (bpy.types.NodeGroupOutput,) if source.material is None else (bpy.types.ShaderNodeOutputMaterial,)
+            snapshot = snapshot_nodes(list(source.node_tree.nodes), make_function=True, output_node_types=output_node_types, named_outputs=source.material is not None)
+        except Exception as e:
+            failures.append((source.name, str(e)))
+            continue
+        dependencies = set()
+        for info in snapshot.nodes:
+            if info.group_tree in function_names:
+                info.group_tree = info.alt_func_name = function_names[info.group_tree]
+                info.args.pop('node_tree', None)
+                dependencies.add(info.group_tree)
+
+        function_name = make_identifier(source.name, '_tree' if source.material is None else '_material', used)
+        if source.material is None:
+            key = content_key(snapshot)
+            if key in seen:
+                function_names[source.name] = seen[key]
+                aliases[seen[key]].append(function_name)
+                continue
+            seen[key] = function_names[source.name] = function_name
+            decorator = f"{tree_decorators[snapshot.type]}({source.name!r})"
+        else:
+            decorator = f"materialtree({source.name!r})"
+        modules[function_name] = sorted(dependencies)
+        aliases[function_name] = []
+        jobs.append((snapshot, function_name, decorator))
+
+    scripts = format_snapshots(jobs, processes)
+    snapshots = { function_name: snapshot for snapshot, function_name, _ in jobs }
+    os.makedirs(directory, exist_ok=True)
+    for (_, function_name, _), script in zip(jobs, scripts):
+        lines = [f"from {addon_module} import *", f"from {dynamic_module(snapshots[function_name].type)} import *"]
+        lines += [ f"from .{dependency} import {dependency}" for dependency in modules[function_name] ]
+        lines += ['', '', script]
+        lines += [ f"{alias} = {function_name}" for alias in aliases[function_name] ]
+        with open(os.path.join(directory, f"{function_name}.py"), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    with open(os.path.join(directory, '__init__.py'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join( f"from .{function_name} import {', '.join([function_name] + aliases[function_name])}" for function_name in modules ) + '\n')
+    return Attrs(modules=list(modules), failures=failures)
+
+def main(argv=None):
+    # blender --background file.blend --python-expr "from <addon>.operators.batch_export import main; main()" -- <directory> [--processes N]
+    if argv is None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="Export every node group and material of a .blend file to a script package.")
+    parser.add_argument('directory')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+    result = export_node_trees(args.directory, args.processes)
+    print(f"{len(result.modules)} node trees exported to {args.directory}")
+    for name, error in result.failures:
+        print(f"Could not export {name}: {error}")
+
+
+class ExportNodeTrees(bpy.types.Operator):
+    """Export every Node Group and Material to a Script Package"""
+    bl_idname = "node.export_node_trees"
+    bl_label = "Node Trees as Scripts"
+
+    directory: bpy.props.StringProperty(subtype='DIR_PATH')
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        result = export_node_trees(self.directory)
+        for name, error in result.failures:
+            self.report({'WARNING'}, f"Could not export {name}: {error}")
+        self.report({'INFO'}, f"{len(result.modules)} node trees exported to {self.directory}.")
+        return {'FINISHED'}
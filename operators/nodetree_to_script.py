@@ -1,11 +1,10 @@
 import bpy
 import numpy as np
-from ..api.noderegistrar import NodeRegistrar,upper_snake_case
-from ..api.util import get_unique_subclass_properties, _as_iterable, title_case, lower_snake_case, enabled_sockets, Attrs, level_topo_sort
+from ..api.noderegistrar import NodeRegistrar,upper_snake_case,get_node_registrar
+from ..api.util import get_property_infos, _as_iterable, _as_plain_value, lower_snake_case, enabled_sockets, Attrs
+from ..api.treeindex import TreeIndex, selected_nodes
 from ..api.nodesocket import get_shortened_socket_type_name
-from ..api.nodetree import NodeTree
 from collections import Counter, defaultdict
-import mathutils
 
 
 node_groups = [bpy.types.GeometryNodeGroup,bpy.types.ShaderNodeGroup,bpy.types.CompositorNodeGroup,bpy.types.TextureNodeGroup]
@@ -14,15 +13,21 @@ is_math_vector_or_value_arg = lambda func_name, argname: func_name in ['math','v
 is_node_tree_input_arg = lambda node_type, argname: node_type in node_groups and argname == 'node_tree'
 is_curve_mapping_arg = lambda value: type(value) == bpy.types.CurveMapping
 
-def node_to_script(node):
+numeric_socket_types = ('VALUE','INT','VECTOR','RGBA','ROTATION')
+NUMERIC_SOCKET_SIZE = 4
+_dropped = object()
+
+def node_to_script(node, numeric_inputs):
+    # Arguments of a node. Numeric inputs that may be left at their default are appended to `numeric_inputs`
+    # as `(args, argname, position, value, default_value)` and compared all at once by `drop_default_inputs`.
     node_type = type(node)
     node_info = NodeRegistrar.all_node_info[node_type]
     func_name = node_info.func_name
     args=defaultdict(list)
 
-    for prop in get_unique_subclass_properties(node_info.type):
-        typename = f"{node_info.namespace}.{title_case(prop.identifier)}" if prop.type == 'ENUM'  else prop.type.title()
-        argname = lower_snake_case(prop.identifier)
+    for prop in get_property_infos(node_info.type):
+        typename = f"{node_info.namespace}.{prop.enum_name}" if prop.type == 'ENUM'  else prop.typename
+        argname = prop.argname
         value = getattr(node,prop.identifier)
 
         if len(node_info.default_value[argname][typename]) > 0:
@@ -30,18 +35,17 @@ def node_to_script(node):
         else:
             default_value = None
 
-        if type(value) == mathutils.Vector:
-            value = tuple(value)
-
         if prop.type == 'POINTER':
             if is_node_tree_input_arg(node_type,argname):
                 args[argname].append(repr(value))
                 continue
             elif is_curve_mapping_arg(value):
-                args[argname].append(value)
+                args[argname].append(Attrs(curves=[ [ tuple(point.location) for point in curve.points ] for curve in value.curves ]))
                 continue
             else:
                 continue
+        elif prop.type != 'COLLECTION':
+            value = _as_plain_value(value)
 
         is_default_value = value == default_value
         if not is_default_value or is_math_operation_arg(node_info.func_name,argname):
@@ -58,55 +62,92 @@ def node_to_script(node):
             args[argname].append([])
             continue
         value = getattr(node_input,'default_value',None)
-        
-        if len(node_info.default_value[argname][typename]) > 0:
-            default_value = node_info.default_value[argname][typename][0]
-        else:
-            default_value = None
-        
-        if node_input.type in ['VALUE','INT','VECTOR','RGBA','ROTATION']:
+        default_values = node_info.default_value[argname][typename]
+        default_value = default_values[0] if len(default_values) > 0 else None
+        keep = node_input.is_linked or len(default_values) > 1 or is_math_vector_or_value_arg(func_name,argname)
+
+        if node_input.type in numeric_socket_types:
             value = tuple(_as_iterable(value))
-            is_default_value = False if default_value is None else np.mean( np.abs( np.array( value  ) - np.array( default_value  ) ) ) < 1e-6
+            if not keep and default_value is not None:
+                numeric_inputs.append((args, argname, len(args[argname]), value, tuple(_as_iterable(default_value))))
             value = value if len(value) > 1 else value[0]
-        else:
-            is_default_value = value == default_value
-            value = repr(value)
-
-        if not is_default_value or node_input.is_linked or len(node_info.default_value[argname][typename]) > 1 or is_math_vector_or_value_arg(func_name,argname):
             args[argname].append(value)
+        elif keep or not value == default_value:
+            args[argname].append(repr(value))
+
+    alt_func_name = None
+    if is_math_operation_arg(func_name,'operation') and args.get('operation'):
+        operation = args['operation'][0].split('.')[-1]
+        alt_func_name = NodeRegistrar.math_aliases.get(lower_snake_case(operation),lower_snake_case(operation))
+
+    return Attrs(func_name=func_name,alt_func_name=alt_func_name,args=args)
+
+def drop_default_inputs(numeric_inputs):
+    # Vectorized comparison of numeric input values with their defaults, padded to the largest socket size.
+    # Scalars are broadcast to the size of the other operand like NumPy does. Inputs equal to their default are removed from the arguments.
+    if not numeric_inputs:
+        return
+    values = np.zeros((len(numeric_inputs), NUMERIC_SOCKET_SIZE))
+    default_values = np.zeros((len(numeric_inputs), NUMERIC_SOCKET_SIZE))
+    sizes = np.ones(len(numeric_inputs))
+    comparable = np.ones(len(numeric_inputs), dtype=bool)
+    for i, (_, _, _, value, default_value) in enumerate(numeric_inputs):
+        size = max(len(value), len(default_value))
+        if size > NUMERIC_SOCKET_SIZE or len(value) not in (1, size) or len(default_value) not in (1, size):
+            comparable[i] = False
+            continue
+        values[i, :size] = value
+        default_values[i, :size] = default_value
+        sizes[i] = size
+    is_default_value = comparable & (np.abs(values - default_values).sum(axis=1) / sizes < 1e-6)
+    touched = {}
+    for (args, argname, position, _, _), is_default in zip(numeric_inputs, is_default_value):
+        if is_default:
+            args[argname][position] = _dropped
+            touched[(id(args), argname)] = (args, argname)
+    for args, argname in touched.values():
+        args[argname] = [ value for value in args[argname] if value is not _dropped ]
+        if not args[argname]:
+            del args[argname]
+
+def tree_inputs(node_tree):
+    if hasattr(node_tree, 'interface'):
+        return [ item for item in node_tree.interface.items_tree if item.item_type == 'SOCKET' and item.in_out == 'INPUT' ]
+    return list(node_tree.inputs)
+
+def snapshot_nodes(nodes,make_function=False,output_node_types=(bpy.types.NodeGroupOutput,),named_outputs=False):
+    """
+    Everything needed to write the script of `nodes` (all from the same tree), read in a single pass into plain data:
+    node arguments with the links resolved to symbols, the tree inputs and outputs. The result can be formatted by `format_script`
+    without access to Blender data.
+
+    Links into nodes of `output_node_types` are the outputs of the tree. The links of every node, and the links to the outputs,
+    are also kept as `(argname, input_index, from_symbol, from_socket_identifier)` and `(from_symbol, from_socket_identifier, to_socket_identifier)`.
+    With `named_outputs`, the function returns its outputs by the name of the socket they are linked to, as the material output does.
+    Tree input defaults are kept as their `repr`, so snapshots hold no Blender data and can be sent to other processes.
+    """
+    node_tree = nodes[0].id_data
+    get_node_registrar(node_tree.bl_idname.replace('NodeTree',''))
+    index = TreeIndex(node_tree, None if len(nodes) == len(node_tree.nodes) else nodes)
+    sorted_nodes = [node for col in index.levels() for node in col]
 
-    script_info = Attrs(func_name=func_name,args=args)
-
-    return script_info
-
-
-def nodes_to_script(nodes,make_function=False):
     outputs = []
     inputs = {}
-
-    if len(nodes) == 0:
-        return ''
-    node_tree = nodes[0].id_data
-
-    graph = { node:set() for node in nodes }
-    links = []
-    for link in node_tree.links:
-        if link.from_node in graph and link.to_node in graph:
-            graph[link.from_node].add(link.to_node)
-            links.append(link)
-
-    columns = level_topo_sort(graph)
-    sorted_nodes = [node for col in columns for node in col]
-
     symbol_count = Counter()
     script_info={}
+    numeric_inputs = []
     for node in sorted_nodes:
-        script_info[node]=node_to_script(node)
-        symbol_count[script_info[node].func_name]+=1
-        script_info[node].symbol = f'{script_info[node].func_name}{symbol_count[script_info[node].func_name]}'
-
-        if type(node) == bpy.types.NodeGroupInput:
-            for tree_input in NodeTree(node_tree.name).inputs:
+        info = script_info[node] = node_to_script(node, numeric_inputs)
+        symbol_count[info.func_name]+=1
+        info.symbol = f'{info.func_name}{symbol_count[info.func_name]}'
+        info.is_group_input = type(node) == bpy.types.NodeGroupInput
+        info.is_group_output = type(node) in output_node_types
+        info.group_tree = node.node_tree.name if type(node) in node_groups and node.node_tree is not None else None
+        info.func_call = None
+        info.links = []
+
+        if info.is_group_input and not inputs:
+            for tree_input in tree_inputs(node_tree):
                 argname = lower_snake_case(tree_input.name)
                 socket_type = tree_input.bl_socket_idname
                 typename = socket_type.replace('NodeSocket','')
@@ -114,19 +155,39 @@ def nodes_to_script(nodes,make_function=False):
                 value = getattr(tree_input,'default_value',None)
                 if enum_socket_type in ['VECTOR','RGBA','ROTATION']:
                     value = tuple(_as_iterable(value))
-                inputs[argname] = Attrs(socket_type=typename,default_value=value)
+                inputs[argname] = Attrs(socket_type=typename,default_value=None if value is None else repr(value))
 
-    for link in links:
+        if type(node) in [bpy.types.ShaderNodeValue,bpy.types.ShaderNodeRGB,bpy.types.CompositorNodeValue]:
+            data_path = f'nodes["{node.name}"].outputs[0].default_value'
+            fcurve = node_tree.animation_data.drivers.find(data_path) if node_tree.animation_data else None
+            if fcurve:
+                info.func_call = f"scripted_expression('{fcurve.driver.expression}')"
+            else:
+                value = node.outputs[0].default_value
+                value = tuple(_as_iterable(value))
+                if len(value) == 1:
+                    value = value[0]
+                info.func_call = f"State.NodeSocket.create({value})"
+    drop_default_inputs(numeric_inputs)
+
+    output_counts = {}
+    output_links = []
+    for link in index.links:
         from_symbol = script_info[link.from_node].symbol
-        if len( list(enabled_sockets(link.from_node.outputs)) ) > 1:
+        from_link = (from_symbol, link.from_socket.identifier)
+        from_pointer = link.from_node.as_pointer()
+        if from_pointer not in output_counts:
+            output_counts[from_pointer] = len( list(enabled_sockets(link.from_node.outputs)) )
+        if output_counts[from_pointer] > 1:
             from_symbol += f".{lower_snake_case(link.from_socket.name)}"
 
         if make_function:
             if type(link.from_node) == bpy.types.NodeGroupInput:
                 from_symbol = lower_snake_case(link.from_socket.name)
 
-        if type(link.to_node) == bpy.types.NodeGroupOutput:
-            outputs.append(from_symbol)
+        if type(link.to_node) in output_node_types:
+            outputs.append(f"'{lower_snake_case(link.to_socket.name)}': {from_symbol}" if named_outputs else from_symbol)
+            output_links.append(from_link + (link.to_socket.identifier,))
             continue
 
         if type(link.to_node) in node_groups:
@@ -134,55 +195,44 @@ def nodes_to_script(nodes,make_function=False):
         else:
             input_index = NodeRegistrar.all_node_info[type(link.to_node)].input_index[link.to_socket.identifier]
 
+        argname = lower_snake_case(link.to_socket.name)
+        script_info[link.to_node].links.append((argname, input_index) + from_link)
         if link.to_socket.is_multi_input:
-            script_info[link.to_node].args[lower_snake_case(link.to_socket.name)][input_index].append(from_symbol)
+            script_info[link.to_node].args[argname][input_index].append(from_symbol)
         else:
-            script_info[link.to_node].args[lower_snake_case(link.to_socket.name)][input_index] = from_symbol
+            script_info[link.to_node].args[argname][input_index] = from_symbol
+
+    return Attrs(name=node_tree.name,type=node_tree.type,nodes=[ script_info[node] for node in sorted_nodes ],inputs=inputs,outputs=outputs,output_links=output_links,named_outputs=named_outputs)
 
+def format_script(snapshot,make_function=False,function_name=None,decorator=None):
     script_lines = []
-    for node in sorted_nodes:
-        if type(node) == bpy.types.NodeGroupOutput:
+    for info in snapshot.nodes:
+        if info.is_group_output:
             continue
 
         if make_function:
-            if type(node) == bpy.types.NodeGroupInput:
+            if info.is_group_input:
                 continue
 
-        symbol = script_info[node].symbol
-        func_name = script_info[node].func_name
+        symbol = info.symbol
+        func_name = info.func_name
         func_args = []
-        alt_func_name = None
-        no_args_input_node = type(node) in [bpy.types.ShaderNodeValue,bpy.types.ShaderNodeRGB,bpy.types.CompositorNodeValue]
-
-
-        if no_args_input_node:
-            data_path = f'nodes["{node.name}"].outputs[0].default_value'
-            fcurve = node_tree.animation_data.drivers.find(data_path) if node_tree.animation_data else None
-            if fcurve:
-                func_call = f"scripted_expression('{fcurve.driver.expression}')"
-            else:
-                value = node.outputs[0].default_value
-                value = tuple(_as_iterable(value))
-                if len(value) == 1:
-                    value = value[0]
-                func_call = f"State.NodeSocket.create({value})"
 
-            script_line = f"{symbol} = {func_call}"
+        if info.func_call is not None:
+            script_line = f"{symbol} = {info.func_call}"
             script_lines.append(script_line)
             continue
 
-        for arg, vals in script_info[node].args.items():
+        for arg, vals in info.args.items():
             if is_math_operation_arg(func_name,arg):
-                operation = vals[0].split('.')[-1]
-                alt_func_name = NodeRegistrar.math_aliases.get(lower_snake_case(operation),lower_snake_case(operation))
                 continue
             if is_math_vector_or_value_arg(func_name,arg):
                 arg_str = str(vals).replace("'","")[1:-1]
                 func_args.append(arg_str)
                 continue
 
-            if is_curve_mapping_arg(vals[0]):
-                curves = str([ "Curve([" + ','.join( f"Point({p.location[0]},{p.location[1]})" for p in curve.points) + "])" for curve in vals[0].curves]).replace("'","")
+            if isinstance(vals[0],Attrs):
+                curves = str([ "Curve([" + ','.join( f"Point({x},{y})" for x, y in points) + "])" for points in vals[0].curves]).replace("'","")
                 if len(vals[0].curves) == 1:
                     curves = curves[1:-1]
                 script_line = f"{symbol}_mapping = {curves}"
@@ -198,8 +248,8 @@ def nodes_to_script(nodes,make_function=False):
                 arg_str = arg_str.replace("'","")
             func_args.append(arg_str)
 
-        if alt_func_name:
-            func_name = alt_func_name
+        if info.alt_func_name:
+            func_name = info.alt_func_name
         func_call = f"{func_name}({','.join(func_args)})"
 
         script_line = f"{symbol} = {func_call}"
@@ -209,12 +259,19 @@ def nodes_to_script(nodes,make_function=False):
     script = delim.join(script_lines)
 
     if make_function:
-        default_value_str = lambda val: f' = {repr(val.default_value)}' if val.default_value is not None else ''
-        function_def_script_line = f"def {node_tree.name}_copy({', '.join([f'{arg}: {val.socket_type}{default_value_str(val)}' for arg, val in inputs.items()])}):"
-        return_script_line = f"    return {', '.join(outputs)}"
-        script = '\n'.join([f"@{node_tree.type.lower()}tree",function_def_script_line,'    '+script,return_script_line])
+        default_value_str = lambda val: f' = {val.default_value}' if val.default_value is not None else ''
+        function_name = function_name or f"{snapshot.name}_copy"
+        decorator = decorator or f"{snapshot.type.lower()}tree"
+        function_def_script_line = f"def {function_name}({', '.join([f'{arg}: {val.socket_type}{default_value_str(val)}' for arg, val in snapshot.inputs.items()])}):"
+        return_script_line = f"    return {{{', '.join(snapshot.outputs)}}}" if snapshot.named_outputs else f"    return {', '.join(snapshot.outputs)}"
+        script = '\n'.join([f"@{decorator}",function_def_script_line,'    '+script,return_script_line])
     return script
 
+def nodes_to_script(nodes,make_function=False):
+    if len(nodes) == 0:
+        return ''
+    return format_script(snapshot_nodes(nodes,make_function),make_function)
+
 
 class CopySelectedNodes(bpy.types.Operator):
     """Copy Selected Nodes to Clipboard"""
@@ -224,10 +281,10 @@ class CopySelectedNodes(bpy.types.Operator):
     def execute(self, context):
         if context.space_data.type == 'NODE_EDITOR' and context.space_data.node_tree:
             node_tree = context.space_data.path[-1].node_tree
-            selected_nodes = [node for node in node_tree.nodes if node.select]
-            script = nodes_to_script(selected_nodes)
+            nodes = selected_nodes(node_tree)
+            script = nodes_to_script(nodes)
             bpy.context.window_manager.clipboard = script
-            self.report({'INFO'}, f"{len(selected_nodes)} nodes copied to clipboard.")
+            self.report({'INFO'}, f"{len(nodes)} nodes copied to clipboard.")
 
         return {'FINISHED'}
 